@@ -1,3 +1,4 @@
+import atexit
 from flask import Flask
 from flask_restx import Api
 from flask_jwt_extended import JWTManager
@@ -50,6 +51,13 @@ def create_app():
     from migrations.init_db import init_db
     init_db(app)
     
+    # Shared AI clients: optional warm-up at boot, clean shutdown at exit
+    from services.agentic_services.client_registry import ClientRegistry
+    registry = ClientRegistry()
+    if Config.AI_CLIENTS_WARMUP:
+        registry.warm_up()
+    atexit.register(registry.shutdown)
+    
     @app.route('/')
     def index():
         """Health check endpoint"""
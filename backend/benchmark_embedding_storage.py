@@ -0,0 +1,192 @@
+"""
+Recall / latency / memory benchmark for reduced-dimension and quantized embeddings.
+
+Chunks come from the chunk store (documents ingested after it was added) and
+queries from past RAG chat messages, so the numbers reflect our own corpus.
+Ground truth is exact cosine search over native-size float32 vectors,
+embedded straight from the provider (bypassing the embedding cache). Every
+(dimensions, dtype) variant is loaded into a FaissCollection built exactly as
+the FAISS vector store builds it (FAISS_INDEX_TYPE and its settings, with
+FAISS_VECTOR_DTYPE set to the variant's dtype), flushed to disk and queried
+through its memory-mapped index. The table shows what the FAISS backend would
+serve: recall@k from the quantized index alone and after its float32
+rescoring, the size of index.faiss, and query latency including the rescore
+(requires faiss-cpu).
+
+Shortened vectors are produced by truncating and re-normalizing the native
+ones, which is how text-embedding-3 implements the `dimensions` parameter;
+pass --api-dimensions to request them from the API instead.
+
+    python benchmark_embedding_storage.py [--dimensions 256 512 1024] [--k 6] [--index-type hnsw]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app import create_app
+from config import Config
+from models import ChatHistory, Document
+from services.agentic_services.client_registry import ClientRegistry
+from services.agentic_services.faiss_vector_store import FaissCollection, INDEX_FILE
+from services.agentic_services.vector_codec import split_embedding_model
+
+
+def load_corpus(registry, max_chunks):
+    """Chunk texts of ready documents from the chunk store"""
+    texts = []
+    documents = Document.query.filter(
+        Document.source_document_id.is_(None),
+        Document.status == 'ready'
+    ).order_by(Document.id).all()
+    for document in documents:
+        if not registry.chunk_store.exists(document.id):
+            continue
+        with registry.chunk_store.open(document.id) as stored:
+            for text, _ in stored.chunks():
+                texts.append(text)
+                if len(texts) >= max_chunks:
+                    return texts
+    return texts
+
+
+def load_queries(corpus, count):
+    """Recent RAG questions, topped up with chunk openings if there are too few"""
+    queries = [
+        message for (message,) in ChatHistory.query.with_entities(ChatHistory.message)
+        .filter_by(chat_type='rag').order_by(ChatHistory.id.desc()).limit(count * 4)
+    ]
+    queries = list(dict.fromkeys(queries))[:count]
+    if len(queries) < count:
+        queries += [text[:200] for text in random.sample(corpus, min(len(corpus), count - len(queries)))]
+    return queries
+
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def top_k(queries, corpus, k):
+    scores = queries @ corpus.T
+    candidates = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, candidates, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def embed(registry, model, texts):
+    """Exact provider embeddings, never served from the embedding cache"""
+    return np.asarray(registry.embeddings_for(model).embed_documents(texts), dtype=np.float32)
+
+
+def embed_queries(registry, model, texts):
+    return np.asarray([registry.embeddings_for(model).embed_query(text) for text in texts], dtype=np.float32)
+
+
+def build_collection(path, vectors, dtype, args):
+    """FAISS collection of the corpus vectors, flushed to disk and memory-mapped"""
+    collection = FaissCollection(
+        path,
+        index_type=args.index_type,
+        hnsw_m=Config.FAISS_HNSW_M,
+        hnsw_ef_search=Config.FAISS_HNSW_EF_SEARCH,
+        ivf_nlist=Config.FAISS_IVF_NLIST,
+        ivf_nprobe=Config.FAISS_IVF_NPROBE,
+        vector_dtype=dtype,
+        rescore_factor=args.rescore_factor
+    )
+    collection.load()
+    collection.add(
+        [str(i) for i in range(len(vectors))],
+        vectors,
+        [''] * len(vectors),
+        [{'chunk_index': i} for i in range(len(vectors))]
+    )
+    collection.flush()
+    return collection
+
+
+def search(collection, queries, k, rescore_factor):
+    """Top-k chunk indexes per query, and the mean latency in ms"""
+    collection.rescore_factor = rescore_factor
+    found = []
+    started = time.perf_counter()
+    for query in queries:
+        found.append([hit.metadata['chunk_index'] for hit in collection.query(query, k)])
+    return found, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run(args):
+    registry = ClientRegistry()
+    model, native_dimensions = split_embedding_model(args.model)
+    if native_dimensions:
+        raise SystemExit('Pass the base model name; variants are set with --dimensions')
+
+    corpus_texts = load_corpus(registry, args.max_chunks)
+    if len(corpus_texts) <= args.k:
+        raise SystemExit('Not enough stored chunks to benchmark (ingest documents or run migrations.reindex_documents --reparse-missing)')
+    query_texts = load_queries(corpus_texts, args.queries)
+    print(f"Corpus: {len(corpus_texts)} chunks, {len(query_texts)} queries, model {model}")
+
+    corpus_full = normalize(embed(registry, model, corpus_texts))
+    queries_full = normalize(embed_queries(registry, model, query_texts))
+    truth = top_k(queries_full, corpus_full, args.k)
+
+    full_size = corpus_full.shape[1]
+    variants = sorted({full_size, *[d for d in args.dimensions if d < full_size]}, reverse=True)
+
+    print(f"\nFAISS {args.index_type} index, rescoring {args.rescore_factor}x k candidates")
+    print(f"\n{'dims':>6} {'dtype':>8} {'stored':>8} {'MB':>9} {'recall@k':>9} {'rescored':>9} {'ms/query':>9}")
+    for dimensions in variants:
+        if dimensions == full_size:
+            corpus_dims, queries_dims = corpus_full, queries_full
+        elif args.api_dimensions:
+            spec = f"{model}@{dimensions}"
+            corpus_dims = normalize(embed(registry, spec, corpus_texts))
+            queries_dims = normalize(embed_queries(registry, spec, query_texts))
+        else:
+            corpus_dims = normalize(corpus_full[:, :dimensions])
+            queries_dims = normalize(queries_full[:, :dimensions])
+
+        for dtype in args.dtypes:
+            with tempfile.TemporaryDirectory() as path:
+                collection = build_collection(path, corpus_dims, dtype, args)
+                try:
+                    # A rescore factor of 1 only reorders the index's own top k
+                    found, _ = search(collection, queries_dims, args.k, 1)
+                    rescored, latency = search(collection, queries_dims, args.k, args.rescore_factor)
+                    stored = collection.stats()['vector_dtype']
+                    megabytes = os.path.getsize(os.path.join(path, INDEX_FILE)) / 1024 / 1024
+                finally:
+                    collection.close()
+
+            print(f"{dimensions:>6} {dtype:>8} {stored:>8} {megabytes:>9.2f} {recall(found, truth):>9.3f} "
+                  f"{recall(rescored, truth):>9.3f} {latency:>9.3f}")
+
+    print("\nMB is the size of index.faiss (vectors plus index structure; the side table keeps float32 copies).")
+    print("'stored' is what the index holds: int8 stays float32 below 1,000 chunks. Latency includes rescoring.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=split_embedding_model(Config.EMBEDDING_MODEL)[0], help='Base embedding model')
+    parser.add_argument('--dimensions', type=int, nargs='+', default=[256, 512, 1024], help='Shortened sizes to compare')
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'float16', 'int8'], choices=['float32', 'float16', 'int8'])
+    parser.add_argument('--k', type=int, default=Config.RAG_TOP_K, help='Recall cutoff')
+    parser.add_argument('--index-type', default=Config.FAISS_INDEX_TYPE, choices=['hnsw', 'ivf', 'flat'])
+    parser.add_argument('--rescore-factor', type=int, default=Config.FAISS_RESCORE_FACTOR, help='Candidates per result rescored at float32')
+    parser.add_argument('--max-chunks', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--api-dimensions', action='store_true', help='Request shortened vectors from the API instead of truncating')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with create_app().app_context():
+        run(args)
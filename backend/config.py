@@ -38,6 +38,17 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     OPENAI_MODEL = 'gpt-4o'
     OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 0))  # Shortened text-embedding-3 vectors (0 = native size)
+    if EMBEDDING_DIMENSIONS and '@' not in EMBEDDING_MODEL:
+        # Model spec 'name@dimensions' keeps collections and caches apart per size
+        EMBEDDING_MODEL = f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}"
+    OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv('OPENAI_HTTP_MAX_CONNECTIONS', 20))
+    OPENAI_HTTP_MAX_KEEPALIVE = int(os.getenv('OPENAI_HTTP_MAX_KEEPALIVE', 10))
+    OPENAI_HTTP_TIMEOUT_SECONDS = float(os.getenv('OPENAI_HTTP_TIMEOUT_SECONDS', 60))
+    
+    # Build AI clients at startup instead of on the first request
+    AI_CLIENTS_WARMUP = os.getenv('AI_CLIENTS_WARMUP', 'False') == 'True'
     
     # Google Gemini (Deprecated)
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
@@ -48,10 +59,74 @@ class Config:
     
     # Vector Database
     CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './data/chroma')
+    VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'chroma')  # 'chroma' or 'faiss'
+    FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', './data/faiss')
+    FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'hnsw')  # 'hnsw', 'ivf' or 'flat'
+    FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', 32))
+    FAISS_HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', 64))
+    FAISS_IVF_NLIST = int(os.getenv('FAISS_IVF_NLIST', 256))
+    FAISS_IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', 16))
+    FAISS_COMPACT_RATIO = float(os.getenv('FAISS_COMPACT_RATIO', 0.2))  # Rebuild HNSW once this share is deleted
+    FAISS_FLUSH_SECONDS = float(os.getenv('FAISS_FLUSH_SECONDS', 5))
+    FAISS_MAX_OPEN_COLLECTIONS = int(os.getenv('FAISS_MAX_OPEN_COLLECTIONS', 64))
+    FAISS_VECTOR_DTYPE = os.getenv('FAISS_VECTOR_DTYPE', 'float32')  # Index storage: float32, float16 or int8
+    FAISS_RESCORE_FACTOR = int(os.getenv('FAISS_RESCORE_FACTOR', 4))  # Candidates per result rescored at float32
     DOCUMENTS_PATH = os.getenv('DOCUMENTS_PATH', './data/documents')
     
+    # RAG storage layout: 'per_user' keeps one collection per user with
+    # document metadata filters, 'per_document' one collection per file
+    RAG_STORAGE_MODE = os.getenv('RAG_STORAGE_MODE', 'per_user')
+    RAG_COLLECTION_SHARDS = int(os.getenv('RAG_COLLECTION_SHARDS', 0))  # >0 folds users onto N tenant collections
+    RAG_CHUNK_SIZE = int(os.getenv('RAG_CHUNK_SIZE', 1000))
+    RAG_CHUNK_OVERLAP = int(os.getenv('RAG_CHUNK_OVERLAP', 200))
+    RAG_TOP_K = int(os.getenv('RAG_TOP_K', 6))
+    RAG_MMR_ENABLED = os.getenv('RAG_MMR_ENABLED', 'True') == 'True'
+    RAG_MMR_FETCH_K = int(os.getenv('RAG_MMR_FETCH_K', 20))  # Candidates considered before MMR
+    RAG_MMR_LAMBDA = float(os.getenv('RAG_MMR_LAMBDA', 0.5))
+    RAG_HYBRID_ENABLED = os.getenv('RAG_HYBRID_ENABLED', 'True') == 'True'  # Fuse BM25 keyword search with vectors
+    RAG_RRF_K = int(os.getenv('RAG_RRF_K', 60))  # Reciprocal-rank fusion damping
+    LEXICAL_INDEX_PATH = os.getenv('LEXICAL_INDEX_PATH', './data/lexical_index.sqlite3')
+    RAG_ANSWER_CACHE_ENABLED = os.getenv('RAG_ANSWER_CACHE_ENABLED', 'True') == 'True'
+    RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv('RAG_ANSWER_CACHE_THRESHOLD', 0.95))  # Cosine similarity of cached questions
+    RAG_ANSWER_CACHE_TTL_SECONDS = int(os.getenv('RAG_ANSWER_CACHE_TTL_SECONDS', 3600))
+    RAG_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('RAG_ANSWER_CACHE_MAX_ENTRIES', 1024))
+    WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv('WEB_SEARCH_CACHE_TTL_SECONDS', 300))  # Results of identical searches are reused this long
+    WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('WEB_SEARCH_CACHE_MAX_ENTRIES', 1024))
+    RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', 3000))
+    
+    # Background ingestion
+    INGESTION_EXTRACT_WORKERS = int(os.getenv('INGESTION_EXTRACT_WORKERS', 2))
+    INGESTION_EMBED_WORKERS = int(os.getenv('INGESTION_EMBED_WORKERS', 2))
+    BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', 500))  # Files accepted per bulk upload
+    EXTRACTION_MAX_QUEUED = int(os.getenv('EXTRACTION_MAX_QUEUED', 16))  # Uploads waiting for a parser process
+    EXTRACTION_CPU_SECONDS = int(os.getenv('EXTRACTION_CPU_SECONDS', 120))  # CPU budget per parsed file
+    CHUNK_STORE_ENABLED = os.getenv('CHUNK_STORE_ENABLED', 'True') == 'True'
+    CHUNK_STORE_PATH = os.getenv('CHUNK_STORE_PATH', './data/chunks')  # Extracted text + chunk boundaries per document
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 256))  # Texts per embeddings API request
+    EMBEDDING_MAX_IN_FLIGHT = int(os.getenv('EMBEDDING_MAX_IN_FLIGHT', 4))  # Concurrent embeddings API requests
+    EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 6))
+    EMBEDDING_MIGRATION_CHUNKS_PER_SECOND = float(os.getenv('EMBEDDING_MIGRATION_CHUNKS_PER_SECOND', 100))  # Re-embedding throttle
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True') == 'True'
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', './data/embedding_cache.sqlite3')
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 50000))  # ~6 KB each at 1536 dims
+    RAG_QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('RAG_QUERY_EMBEDDING_CACHE_SIZE', 256))
+    RAG_RETRIEVAL_WORKERS = int(os.getenv('RAG_RETRIEVAL_WORKERS', 8))
+    RAG_RETRIEVAL_DEADLINE_SECONDS = float(os.getenv('RAG_RETRIEVAL_DEADLINE_SECONDS', 5))
+    RAG_WEB_SEARCH_WORKERS = int(os.getenv('RAG_WEB_SEARCH_WORKERS', 4))
+    RAG_WEB_SEARCH_TIMEOUT_SECONDS = float(os.getenv('RAG_WEB_SEARCH_TIMEOUT_SECONDS', 5))  # Counted from when the search starts, alongside retrieval
+    
+    # Local embeddings (EMBEDDING_MODEL=local:<sentence-transformers model>)
+    LOCAL_EMBEDDING_DEVICE = os.getenv('LOCAL_EMBEDDING_DEVICE', 'cpu')
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv('LOCAL_EMBEDDING_BATCH_SIZE', 32))
+    LOCAL_EMBEDDING_WORKERS = int(os.getenv('LOCAL_EMBEDDING_WORKERS', 0))  # 0 = run the model in-process
+    LOCAL_EMBEDDING_TORCH_THREADS = int(os.getenv('LOCAL_EMBEDDING_TORCH_THREADS', 0))  # 0 = torch default
+    LOCAL_EMBEDDING_CACHE_DIR = os.getenv('LOCAL_EMBEDDING_CACHE_DIR', './data/models')
+    
     # Guardrails
     GUARDRAILS_ENABLED = os.getenv('GUARDRAILS_ENABLED', 'True') == 'True'
+    # Streamed answers are held back by at most this many characters while
+    # output guardrails decide whether they are safe to send
+    GUARDRAILS_STREAM_WINDOW = int(os.getenv('GUARDRAILS_STREAM_WINDOW', '128'))
     
     # File Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -69,4 +144,5 @@ class Config:
         """Initialize application with config"""
         # Create necessary directories
         os.makedirs(Config.CHROMA_DB_PATH, exist_ok=True)
+        os.makedirs(Config.FAISS_INDEX_PATH, exist_ok=True)
         os.makedirs(Config.DOCUMENTS_PATH, exist_ok=True)
@@ -15,6 +15,7 @@ from dtos.app_data.chat_dto import (
 from config import Config
 
 from utils.marshmallow_utils import marshmallow_to_restx_model
+from utils.sse_utils import sse_response
 
 chat_ns = Namespace('chat', description='Chat operations with tool calling')
 
@@ -37,6 +38,70 @@ chat_request_model = chat_ns.model('ToolChatRequest', {
     'message': fields.String(required=True, description='User message')
 })
 
+def _parse_chat_request(user_id):
+    """
+    Read the message and uploaded images of a tool chat request and check
+    the message against the input guardrails
+    
+    Returns:
+        tuple: (message, list of temporary image paths)
+    """
+    # Check if request has files (multipart/form-data)
+    images = []
+    message = None
+    
+    if request.files or request.form:
+        # Handle multipart form data
+        message = request.form.get('message')
+        if not message:
+            chat_ns.abort(400, 'Message is required')
+        
+        # Process uploaded images
+        for key in request.files:
+            file = request.files[key]
+            if file and file.filename:
+                # Validate image type
+                filename = secure_filename(file.filename)
+                ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+                
+                allowed_image_types = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+                if ext not in allowed_image_types:
+                    chat_ns.abort(400, f'Invalid image type. Allowed: {allowed_image_types}')
+                
+                # Save temporarily
+                temp_dir = os.path.join(Config.DOCUMENTS_PATH, 'temp_images')
+                os.makedirs(temp_dir, exist_ok=True)
+                
+                temp_filename = f"{uuid.uuid4()}_{filename}"
+                temp_path = os.path.join(temp_dir, temp_filename)
+                file.save(temp_path)
+                images.append(temp_path)
+    else:
+        # Handle JSON request
+        data = ToolChatRequestSchema().load(request.get_json())
+        message = data['message']
+    
+    # Check guardrails on input
+    guardrails_result = GuardrailsService.check_content(
+        message,
+        user_id,
+        'input'
+    )
+    
+    if not guardrails_result['passed']:
+        # Clean up temp images
+        _remove_images(images)
+        
+        chat_ns.abort(400, 'Content violates guardrails', violations=guardrails_result['violations'])
+    
+    return message, images
+
+def _remove_images(images):
+    """Delete temporary image uploads"""
+    for img_path in images:
+        if os.path.exists(img_path):
+            os.remove(img_path)
+
 @chat_ns.route('/tool-calling')
 class ToolChat(Resource):
     @chat_ns.doc('tool_chat')
@@ -49,56 +114,7 @@ class ToolChat(Resource):
         """Chat with tool calling and optional image support"""
         try:
             user_id = get_jwt_identity()
-            
-            # Check if request has files (multipart/form-data)
-            images = []
-            message = None
-            
-            if request.files or request.form:
-                # Handle multipart form data
-                message = request.form.get('message')
-                if not message:
-                    chat_ns.abort(400, 'Message is required')
-                
-                # Process uploaded images
-                for key in request.files:
-                    file = request.files[key]
-                    if file and file.filename:
-                        # Validate image type
-                        filename = secure_filename(file.filename)
-                        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-                        
-                        allowed_image_types = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
-                        if ext not in allowed_image_types:
-                            chat_ns.abort(400, f'Invalid image type. Allowed: {allowed_image_types}')
-                        
-                        # Save temporarily
-                        temp_dir = os.path.join(Config.DOCUMENTS_PATH, 'temp_images')
-                        os.makedirs(temp_dir, exist_ok=True)
-                        
-                        temp_filename = f"{uuid.uuid4()}_{filename}"
-                        temp_path = os.path.join(temp_dir, temp_filename)
-                        file.save(temp_path)
-                        images.append(temp_path)
-            else:
-                # Handle JSON request
-                data = ToolChatRequestSchema().load(request.get_json())
-                message = data['message']
-            
-            # Check guardrails on input
-            guardrails_result = GuardrailsService.check_content(
-                message,
-                user_id,
-                'input'
-            )
-            
-            if not guardrails_result['passed']:
-                # Clean up temp images
-                for img_path in images:
-                    if os.path.exists(img_path):
-                        os.remove(img_path)
-                
-                chat_ns.abort(400, 'Content violates guardrails', violations=guardrails_result['violations'])
+            message, images = _parse_chat_request(user_id)
             
             # Initialize chat service
             chat_service = ChatService()
@@ -115,9 +131,7 @@ class ToolChat(Resource):
             )
             
             # Clean up temp images
-            for img_path in images:
-                if os.path.exists(img_path):
-                    os.remove(img_path)
+            _remove_images(images)
             
             # Check guardrails on output
             output_check = GuardrailsService.check_content(
@@ -137,6 +151,39 @@ class ToolChat(Resource):
         except Exception as e:
             return {'message': f'Chat failed: {str(e)}'}, 500
 
+@chat_ns.route('/tool-calling/stream')
+class ToolChatStream(Resource):
+    @chat_ns.doc('tool_chat_stream')
+    @chat_ns.expect(chat_parser)
+    @jwt_required()
+    def post(self):
+        """Chat with tool calling, streaming the answer as Server-Sent Events"""
+        try:
+            user_id = get_jwt_identity()
+            message, images = _parse_chat_request(user_id)
+            
+            chat_service = ChatService()
+            history = chat_service.get_chat_history(user_id, 'tool', limit=10)
+            
+            try:
+                # Images are encoded before this returns
+                events = chat_service.stream_chat_with_tools(
+                    message=message,
+                    user_id=user_id,
+                    chat_history=history,
+                    images=images if images else None
+                )
+            finally:
+                _remove_images(images)
+            
+            return sse_response(GuardrailsService.check_stream_output(events, user_id))
+        except ValidationError as err:
+            return err.messages, 400
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': f'Chat failed: {str(e)}'}, 500
+
 @chat_ns.route('/history')
 class ChatHistory(Resource):
     @chat_ns.doc('get_history')
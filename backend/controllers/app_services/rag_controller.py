@@ -6,48 +6,116 @@ from werkzeug.datastructures import FileStorage
 
 from services.agentic_services.rag_service import RAGService
 from services.guardrails_services.guardrails_service import GuardrailsService
+from services.auth_services.auth_service import AuthService
 from dtos.app_data.rag_dto import (
-    DocumentSchema, RagChatRequestSchema, RagChatResponseSchema
+    DocumentSchema, IngestionJobSchema, BatchJobSchema, EmbeddingMigrationRequestSchema, RagChatRequestSchema, RagChatResponseSchema
 )
 
 from utils.marshmallow_utils import marshmallow_to_restx_model
+from utils.sse_utils import sse_response
 
 rag_ns = Namespace('rag', description='RAG (Retrieval Augmented Generation) operations')
 
 # Models for Swagger generated from Marshmallow Schemas
 document_model = marshmallow_to_restx_model(rag_ns, DocumentSchema)
+job_model = marshmallow_to_restx_model(rag_ns, IngestionJobSchema)
+batch_model = marshmallow_to_restx_model(rag_ns, BatchJobSchema)
+migration_request_model = marshmallow_to_restx_model(rag_ns, EmbeddingMigrationRequestSchema)
 chat_request_model = marshmallow_to_restx_model(rag_ns, RagChatRequestSchema)
 chat_response_model = marshmallow_to_restx_model(rag_ns, RagChatResponseSchema)
 
 upload_parser = rag_ns.parser()
 upload_parser.add_argument('file', location='files', type=FileStorage, required=True, help='Document file')
 
+bulk_upload_parser = rag_ns.parser()
+bulk_upload_parser.add_argument(
+    'files', location='files', type=FileStorage, action='append', required=True,
+    help='Document files and/or ZIP archives'
+)
+
 @rag_ns.route('/upload')
 class UploadDocument(Resource):
     @rag_ns.doc('upload_document')
     @rag_ns.expect(upload_parser)
-    @rag_ns.marshal_with(document_model, code=201)
+    @rag_ns.marshal_with(document_model, code=202)
     @jwt_required()
     def post(self):
-        """Upload document for RAG"""
+        """Upload document for RAG (processed in the background)"""
         try:
             user_id = get_jwt_identity()
             
             args = upload_parser.parse_args()
             file = args['file']
             
-            # Initialize RAG service
-            rag_service = RAGService()
+            rag_service = RAGService.get_instance()
             
-            # Upload and process document
+            # Save upload and queue it for ingestion
             document = rag_service.upload_document(file, user_id)
             
-            return DocumentSchema().dump(document), 201
+            return DocumentSchema().dump(document), 202
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': f'Upload failed: {str(e)}'}, 500
+
+@rag_ns.route('/upload/bulk')
+class BulkUploadDocuments(Resource):
+    @rag_ns.doc('bulk_upload_documents')
+    @rag_ns.expect(bulk_upload_parser)
+    @rag_ns.marshal_with(batch_model, code=202)
+    @jwt_required()
+    def post(self):
+        """Upload several documents or ZIP archives as one batch (processed in the background)"""
+        try:
+            user_id = get_jwt_identity()
+            
+            args = bulk_upload_parser.parse_args()
+            
+            rag_service = RAGService.get_instance()
+            batch = rag_service.upload_batch(args['files'], user_id)
+            
+            return BatchJobSchema().dump(batch), 202
         except ValueError as e:
             return {'message': str(e)}, 400
         except Exception as e:
             return {'message': f'Upload failed: {str(e)}'}, 500
 
+@rag_ns.route('/batches/<string:batch_id>')
+@rag_ns.param('batch_id', 'Bulk upload batch ID')
+class BatchJob(Resource):
+    @rag_ns.doc('get_batch_job')
+    @rag_ns.marshal_with(batch_model)
+    @jwt_required()
+    def get(self, batch_id):
+        """Get the ingestion status of every file in a bulk upload"""
+        try:
+            user_id = get_jwt_identity()
+            rag_service = RAGService.get_instance()
+            batch = rag_service.get_batch_status(batch_id, user_id)
+            return BatchJobSchema().dump(batch), 200
+        except ValueError as e:
+            return {'message': str(e)}, 404
+        except Exception as e:
+            return {'message': str(e)}, 500
+
+@rag_ns.route('/jobs/<string:job_id>')
+@rag_ns.param('job_id', 'Ingestion job ID')
+class IngestionJob(Resource):
+    @rag_ns.doc('get_ingestion_job')
+    @rag_ns.marshal_with(job_model)
+    @jwt_required()
+    def get(self, job_id):
+        """Get document ingestion status"""
+        try:
+            user_id = get_jwt_identity()
+            rag_service = RAGService.get_instance()
+            job = rag_service.get_job_status(job_id, user_id)
+            return IngestionJobSchema().dump(job), 200
+        except ValueError as e:
+            return {'message': str(e)}, 404
+        except Exception as e:
+            return {'message': str(e)}, 500
+
 @rag_ns.route('/chat')
 class RagChat(Resource):
     @rag_ns.doc('chat_rag')
@@ -70,8 +138,7 @@ class RagChat(Resource):
             if not guardrails_result['passed']:
                 rag_ns.abort(400, 'Content violates guardrails', violations=guardrails_result['violations'])
             
-            # Initialize RAG service
-            rag_service = RAGService()
+            rag_service = RAGService.get_instance()
             
             # Process chat
             response = rag_service.chat_with_documents(
@@ -98,6 +165,44 @@ class RagChat(Resource):
         except Exception as e:
             return {'message': f'Chat failed: {str(e)}'}, 500
 
+@rag_ns.route('/chat/stream')
+class RagChatStream(Resource):
+    @rag_ns.doc('chat_rag_stream')
+    @rag_ns.expect(chat_request_model)
+    @jwt_required()
+    def post(self):
+        """Chat with documents using RAG, streaming the answer as Server-Sent Events"""
+        try:
+            user_id = get_jwt_identity()
+            data = RagChatRequestSchema().load(request.get_json())
+            
+            # Check guardrails on input
+            guardrails_result = GuardrailsService.check_content(
+                data['query'],
+                user_id,
+                'input'
+            )
+            
+            if not guardrails_result['passed']:
+                rag_ns.abort(400, 'Content violates guardrails', violations=guardrails_result['violations'])
+            
+            rag_service = RAGService.get_instance()
+            
+            # Retrieval errors are raised here, before the stream starts
+            events = rag_service.stream_chat_with_documents(
+                query=data['query'],
+                user_id=user_id,
+                use_internet=data.get('use_internet', False)
+            )
+            
+            return sse_response(GuardrailsService.check_stream_output(events, user_id))
+        except ValidationError as err:
+            return err.messages, 400
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': f'Chat failed: {str(e)}'}, 500
+
 @rag_ns.route('/documents')
 class DocumentList(Resource):
     @rag_ns.doc('list_documents')
@@ -107,7 +212,7 @@ class DocumentList(Resource):
         """Get user's documents"""
         try:
             user_id = get_jwt_identity()
-            rag_service = RAGService()
+            rag_service = RAGService.get_instance()
             documents = rag_service.get_user_documents(user_id)
             return DocumentSchema(many=True).dump(documents), 200
         except Exception as e:
@@ -116,16 +221,101 @@ class DocumentList(Resource):
 @rag_ns.route('/documents/<int:document_id>')
 @rag_ns.param('document_id', 'Document ID')
 class Document(Resource):
+    @rag_ns.doc('replace_document')
+    @rag_ns.expect(upload_parser)
+    @rag_ns.marshal_with(document_model, code=202)
+    @jwt_required()
+    def put(self, document_id):
+        """Replace document with a new version (only changed chunks are re-embedded)"""
+        try:
+            user_id = get_jwt_identity()
+            
+            args = upload_parser.parse_args()
+            file = args['file']
+            
+            rag_service = RAGService.get_instance()
+            document = rag_service.replace_document(document_id, file, user_id)
+            
+            return DocumentSchema().dump(document), 202
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': f'Replace failed: {str(e)}'}, 500
+
     @rag_ns.doc('delete_document')
     @jwt_required()
     def delete(self, document_id):
         """Delete document"""
         try:
             user_id = get_jwt_identity()
-            rag_service = RAGService()
+            rag_service = RAGService.get_instance()
             result = rag_service.delete_document(document_id, user_id)
             return result, 200
         except ValueError as e:
             return {'message': str(e)}, 404
         except Exception as e:
             return {'message': str(e)}, 500
+
+@rag_ns.route('/metrics')
+class RagMetrics(Resource):
+    @rag_ns.doc('get_rag_metrics')
+    @jwt_required()
+    def get(self):
+        """Get RAG pipeline metrics (admin only)"""
+        try:
+            AuthService.verify_admin()
+            rag_service = RAGService.get_instance()
+            return rag_service.get_metrics(), 200
+        except ValueError as e:
+            return {'message': str(e)}, 403
+        except Exception as e:
+            return {'message': str(e)}, 500
+
+@rag_ns.route('/embedding-migration')
+class EmbeddingMigration(Resource):
+    @rag_ns.doc('get_embedding_migration')
+    @jwt_required()
+    def get(self):
+        """Get embedding migration progress (admin only)"""
+        try:
+            AuthService.verify_admin()
+            rag_service = RAGService.get_instance()
+            return rag_service.get_embedding_migration_status(), 200
+        except ValueError as e:
+            return {'message': str(e)}, 403
+        except Exception as e:
+            return {'message': str(e)}, 500
+    
+    @rag_ns.doc('start_embedding_migration')
+    @rag_ns.expect(migration_request_model)
+    @jwt_required()
+    def post(self):
+        """Re-embed all documents into another model in the background (admin only)"""
+        try:
+            AuthService.verify_admin()
+        except ValueError as e:
+            return {'message': str(e)}, 403
+        
+        try:
+            data = EmbeddingMigrationRequestSchema().load(request.get_json() or {})
+            rag_service = RAGService.get_instance()
+            return rag_service.start_embedding_migration(data.get('model')), 202
+        except ValidationError as err:
+            return err.messages, 400
+        except ValueError as e:
+            return {'message': str(e)}, 409
+        except Exception as e:
+            return {'message': str(e)}, 500
+    
+    @rag_ns.doc('cancel_embedding_migration')
+    @jwt_required()
+    def delete(self):
+        """Cancel the running embedding migration (admin only)"""
+        try:
+            AuthService.verify_admin()
+            rag_service = RAGService.get_instance()
+            return rag_service.cancel_embedding_migration(), 200
+        except ValueError as e:
+            return {'message': str(e)}, 403
+        except Exception as e:
+            return {'message': str(e)}, 500
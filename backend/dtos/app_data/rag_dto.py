@@ -7,6 +7,40 @@ class DocumentSchema(Schema):
     user_id = fields.Int()
     uploaded_at = fields.Str(attribute='created_at')
     file_size = fields.Int(allow_none=True)
+    job_id = fields.Str(allow_none=True)
+    batch_id = fields.Str(allow_none=True)
+    embedding_model = fields.Str(allow_none=True)
+    embedding_dimension = fields.Int(allow_none=True)
+    status = fields.Str()
+    progress = fields.Int()
+    error_message = fields.Str(allow_none=True)
+
+class IngestionJobSchema(Schema):
+    """Ingestion job status schema"""
+    job_id = fields.Str()
+    document_id = fields.Int()
+    filename = fields.Str()
+    status = fields.Str()
+    progress = fields.Int()
+    error_message = fields.Str(allow_none=True)
+
+class RejectedFileSchema(Schema):
+    """File skipped during a bulk upload"""
+    filename = fields.Str()
+    error = fields.Str()
+
+class BatchJobSchema(Schema):
+    """Bulk upload status schema"""
+    batch_id = fields.Str()
+    status = fields.Str()
+    progress = fields.Int()
+    total = fields.Int()
+    files = fields.List(fields.Nested(IngestionJobSchema))
+    rejected = fields.List(fields.Nested(RejectedFileSchema))
+
+class EmbeddingMigrationRequestSchema(Schema):
+    """Embedding migration request schema"""
+    model = fields.Str(missing=None)
 
 class RagChatRequestSchema(Schema):
     """RAG chat request schema"""
@@ -17,9 +51,13 @@ class SourceSchema(Schema):
     """Source schema"""
     content = fields.Str()
     metadata = fields.Dict()
+    score = fields.Float()
 
 class RagChatResponseSchema(Schema):
     """RAG chat response schema"""
     answer = fields.Str()
     sources = fields.List(fields.Nested(SourceSchema))
     use_internet = fields.Bool()
+    retrieval = fields.Dict()
+    cached = fields.Bool()  # Answer reused from a near-identical earlier question
+    web_search = fields.Str(allow_none=True)  # 'ok', 'timed_out' or 'failed' when use_internet is set
@@ -0,0 +1,98 @@
+"""
+Add documents indexed before hybrid search to the BM25 keyword index.
+
+Nothing is re-embedded: chunk texts are read from the vector store, so the
+keyword rows match the vectors that serve queries, and their metadata
+(page, position) is taken from the chunk store where it has the same chunk.
+Documents that already have keyword rows are skipped unless --force is
+given. Run from the backend directory:
+
+    python -m migrations.backfill_lexical_index [--document-id ID ...] [--force]
+"""
+import argparse
+
+from models import Document
+
+
+def chunk_position(chunk_id, fallback):
+    """Chunk index encoded in a shared-collection ID ('<document>:[<staging>:]<index>')"""
+    last = chunk_id.rsplit(':', 1)[-1]
+    return int(last) if ':' in chunk_id and last.isdigit() else fallback
+
+
+def backfill_document(rag_service, registry, document):
+    """
+    Write a document's chunks to the keyword index from the vector store
+
+    Returns:
+        int: Number of chunks indexed
+    """
+    collection_name = document.vector_store_id
+    shared = rag_service.is_shared_collection(collection_name)
+    stored_chunks = rag_service.vector_store.get_chunks(collection_name, document.id if shared else None)
+    if not stored_chunks:
+        raise ValueError('no chunks in the vector store')
+
+    ordered = sorted(
+        (chunk_position(chunk_id, number), text)
+        for number, (chunk_id, text) in enumerate(stored_chunks)
+    )
+
+    provenance = []
+    if registry.chunk_store.exists(document.id):
+        with registry.chunk_store.open(document.id) as stored:
+            provenance = list(stored.chunks())
+
+    rows = []
+    for index, (_, text) in enumerate(ordered):
+        metadata = {}
+        if index < len(provenance) and provenance[index][0] == text:
+            metadata = provenance[index][1]
+        rows.append((text, rag_service._chunk_metadata(collection_name, document, index, metadata)))
+
+    registry.lexical_index.add(document.id, 0, rows)
+    registry.lexical_index.delete_document(document.id, from_chunk=len(rows))
+    return len(rows)
+
+
+def backfill_lexical_index(app, document_ids=None, force=False):
+    """Index every ready document (or the given ones) that has no keyword rows yet"""
+    from services.agentic_services.client_registry import ClientRegistry
+    from services.agentic_services.rag_service import RAGService
+
+    with app.app_context():
+        registry = ClientRegistry()
+        rag_service = RAGService.get_instance()
+
+        # Deduplicated uploads are searched through their source document
+        query = Document.query.filter(
+            Document.source_document_id.is_(None),
+            Document.status == 'ready'
+        )
+        if document_ids:
+            query = query.filter(Document.id.in_(document_ids))
+        documents = query.order_by(Document.id).all()
+        print(f"Backfilling the keyword index for {len(documents)} documents...")
+
+        for document in documents:
+            if not force and registry.lexical_index.has_document(document.id):
+                continue
+            try:
+                indexed = backfill_document(rag_service, registry, document)
+            except Exception as e:
+                print(f"! Skipping {document.filename}: {e}")
+                continue
+
+            print(f"✓ {document.filename}: {indexed} chunks")
+
+        print("✓ Keyword index backfill complete!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--document-id', type=int, action='append', dest='document_ids', help='Only backfill this document (repeatable)')
+    parser.add_argument('--force', action='store_true', help='Rewrite documents that already have keyword rows')
+    args = parser.parse_args()
+
+    from app import create_app
+    backfill_lexical_index(create_app(), document_ids=args.document_ids, force=args.force)
@@ -0,0 +1,93 @@
+"""
+Fold legacy per-document Chroma collections (doc_*) into per-user collections.
+
+Stored embeddings are copied as-is, so no document is re-embedded. Legacy
+collections are read from Chroma (the only backend that had them) and written
+through the configured VECTOR_STORE_BACKEND. Run from the backend directory:
+
+    python -m migrations.fold_document_collections [--keep-legacy]
+"""
+import argparse
+
+from models import db
+from models import Document
+
+BATCH_SIZE = 500
+
+
+def fold_document_collections(app, keep_legacy=False):
+    """Move every doc_* collection into its owner's shared collection"""
+    from services.agentic_services.client_registry import ClientRegistry
+    from services.agentic_services.rag_service import RAGService
+
+    with app.app_context():
+        registry = ClientRegistry()
+        client = registry.chroma_client
+        vector_store = registry.vector_store
+        # Deduplicated uploads follow their source document
+        documents = Document.query.filter(
+            Document.vector_store_id.like('doc_%'),
+            Document.source_document_id.is_(None)
+        ).all()
+        print(f"Folding {len(documents)} legacy document collections...")
+
+        for document in documents:
+            legacy_name = document.vector_store_id
+            try:
+                legacy = client.get_collection(legacy_name)
+            except Exception as e:
+                print(f"! Skipping {document.filename}: {e}")
+                continue
+
+            model = RAGService.document_model(document)
+            target_name = RAGService.collection_name_for_user(document.user_id, model)
+
+            offset = 0
+            while True:
+                batch = legacy.get(
+                    limit=BATCH_SIZE,
+                    offset=offset,
+                    include=['embeddings', 'documents', 'metadatas']
+                )
+                if not batch['ids']:
+                    break
+
+                metadatas = []
+                for i, metadata in enumerate(batch['metadatas'] or [{}] * len(batch['ids'])):
+                    metadata = dict(metadata or {})
+                    metadata.update({
+                        'document_id': document.id,
+                        'user_id': int(document.user_id),
+                        'chunk_index': offset + i
+                    })
+                    metadatas.append(metadata)
+
+                vector_store.add(
+                    target_name,
+                    [f"{document.id}:{offset + i}" for i in range(len(batch['ids']))],
+                    batch['embeddings'],
+                    batch['documents'],
+                    metadatas,
+                    collection_metadata={'embedding_model': model}
+                )
+                offset += len(batch['ids'])
+
+            document.vector_store_id = target_name
+            Document.query.filter_by(source_document_id=document.id).update({Document.vector_store_id: target_name})
+            db.session.commit()
+
+            if not keep_legacy:
+                client.delete_collection(legacy_name)
+
+            print(f"✓ {document.filename}: {offset} chunks -> {target_name}")
+
+        print("✓ Collection migration complete!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keep-legacy', action='store_true', help='Do not drop the doc_* collections')
+    args = parser.parse_args()
+
+    from app import create_app
+    fold_document_collections(create_app(), keep_legacy=args.keep_legacy)
@@ -1,7 +1,38 @@
+from sqlalchemy import inspect, text
 from models import db
 from models import UserDetailsModel, RoleModel, UserRoleMappingModel,ComponentModel,ComponentRoleMappingModel,SystemConfig
 from services.auth_services.auth_service import AuthService
 
+def add_missing_columns():
+    """Add model columns and indexes missing from existing tables (create_all only creates tables)"""
+    inspector = inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            if column.default is not None and column.default.is_scalar:
+                ddl += f' DEFAULT {column.default.arg!r}'
+            # Without a default, existing rows have no value, so NOT NULL is not enforced here
+
+            print(f"Adding column {table.name}.{column.name}...")
+            with db.engine.begin() as connection:
+                connection.execute(text(ddl))
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=db.engine)
+
+
 def init_db(app):
     """Initialize database with default data"""
     with app.app_context():
@@ -11,6 +42,7 @@ def init_db(app):
         # ---------------------------------------------
         print("Creating database tables...")
         db.create_all()
+        add_missing_columns()
 
         # ---------------------------------------------
         # 2. Create default roles
@@ -0,0 +1,40 @@
+"""
+Re-embed every document into another embedding model without downtime.
+
+Each document is embedded into a collection for the new model while chat
+keeps reading the old vectors, then switched over on its own. Run from the
+backend directory (set EMBEDDING_MODEL to the new model for new uploads):
+
+    python -m migrations.migrate_embedding_model [--model MODEL] [--chunks-per-second N]
+
+The same migration can be started in the background from the admin API
+(POST /api/rag/embedding-migration).
+"""
+import argparse
+
+from config import Config
+
+
+def migrate_embedding_model(app, model, chunks_per_second):
+    """Run the embedding migration in the foreground"""
+    from services.agentic_services.embedding_migration import EmbeddingMigration
+
+    migration = EmbeddingMigration(chunks_per_second=chunks_per_second)
+    migration.run(app, model)
+
+    status = migration.status()
+    print(f"Migrated {status.get('migrated_documents', 0)}/{status.get('total_documents', 0)} documents "
+          f"({status.get('chunks_embedded', 0)} chunks)")
+    for failure in status['failed_documents']:
+        print(f"! Document {failure['document_id']}: {failure['error']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL, help='Target embedding model (default: EMBEDDING_MODEL)')
+    parser.add_argument('--chunks-per-second', type=float, default=Config.EMBEDDING_MIGRATION_CHUNKS_PER_SECOND,
+                        help='Embedding throttle (0 = unthrottled)')
+    args = parser.parse_args()
+
+    from app import create_app
+    migrate_embedding_model(create_app(), args.model, args.chunks_per_second)
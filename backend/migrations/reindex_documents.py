@@ -0,0 +1,111 @@
+"""
+Re-index documents from the chunk store without parsing the uploads again.
+
+By default the stored chunk boundaries are re-embedded with the current
+EMBEDDING_MODEL. With --resplit the stored text is split again using the
+current RAG_CHUNK_SIZE / RAG_CHUNK_OVERLAP. Documents ingested before the
+chunk store existed are skipped unless --reparse-missing is given, in which
+case their upload is parsed once and stored. Run from the backend directory:
+
+    python -m migrations.reindex_documents [--document-id ID ...] [--resplit] [--reparse-missing]
+"""
+import argparse
+
+from models import db
+from models import Document
+from config import Config
+
+
+def reindex_document(rag_service, store, document, resplit=False, reparse_missing=False):
+    """
+    Re-embed a document from its stored text with the current EMBEDDING_MODEL
+
+    Queries keep using only the old vectors until the document is switched
+    over, also when it stays in its current collection: the new chunks are
+    staged there under fresh IDs, hidden from queries, and replace the old
+    ones right after the cutover.
+
+    Returns:
+        int: Number of chunks indexed
+    """
+    from services.agentic_services.chunk_store import split_and_record
+    from services.agentic_services.text_extraction import open_text_blocks
+
+    writer = None
+    stored = None
+    try:
+        if store.exists(document.id):
+            stored = store.open(document.id)
+            if resplit:
+                writer = store.writer(document.id, Config.RAG_CHUNK_SIZE, Config.RAG_CHUNK_OVERLAP)
+                chunks = split_and_record(stored.blocks(), writer, Config.RAG_CHUNK_SIZE, Config.RAG_CHUNK_OVERLAP)
+            else:
+                chunks = stored.chunks()
+        elif reparse_missing:
+            ext = document.filename.rsplit('.', 1)[-1].lower()
+            blocks, _ = open_text_blocks(document.filepath, ext)
+            writer = store.writer(document.id, Config.RAG_CHUNK_SIZE, Config.RAG_CHUNK_OVERLAP)
+            chunks = split_and_record(blocks, writer, Config.RAG_CHUNK_SIZE, Config.RAG_CHUNK_OVERLAP)
+        else:
+            raise ValueError('no stored text (re-run with --reparse-missing to parse the upload once)')
+
+        indexed = rag_service.reembed_document(document, Config.EMBEDDING_MODEL, chunks)
+    except BaseException:
+        if writer:
+            writer.abort()
+        raise
+    finally:
+        if stored:
+            stored.close()
+
+    if writer:
+        writer.commit()
+    return indexed
+
+
+def reindex_documents(app, document_ids=None, resplit=False, reparse_missing=False):
+    """Re-embed every ready document (or the given ones) from the chunk store"""
+    from services.agentic_services.client_registry import ClientRegistry
+    from services.agentic_services.rag_service import RAGService
+
+    with app.app_context():
+        store = ClientRegistry().chunk_store
+        rag_service = RAGService.get_instance()
+
+        # Deduplicated uploads share their source document's vectors
+        query = Document.query.filter(
+            Document.source_document_id.is_(None),
+            Document.status == 'ready'
+        )
+        if document_ids:
+            query = query.filter(Document.id.in_(document_ids))
+        documents = query.order_by(Document.id).all()
+        print(f"Re-indexing {len(documents)} documents with {Config.EMBEDDING_MODEL}...")
+
+        for document in documents:
+            try:
+                indexed = reindex_document(rag_service, store, document, resplit, reparse_missing)
+            except Exception as e:
+                db.session.rollback()
+                print(f"! Skipping {document.filename}: {e}")
+                continue
+
+            print(f"✓ {document.filename}: {indexed} chunks")
+
+        print("✓ Re-indexing complete!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--document-id', type=int, action='append', dest='document_ids', help='Only re-index this document (repeatable)')
+    parser.add_argument('--resplit', action='store_true', help='Split the stored text again with the current chunk settings')
+    parser.add_argument('--reparse-missing', action='store_true', help='Parse uploads that have no stored text yet')
+    args = parser.parse_args()
+
+    from app import create_app
+    reindex_documents(
+        create_app(),
+        document_ids=args.document_ids,
+        resplit=args.resplit,
+        reparse_missing=args.reparse_missing
+    )
@@ -13,6 +13,20 @@ class Document(db.Model):
     vector_store_id = db.Column(db.String(100), nullable=True)  # Chroma collection ID
     file_size = db.Column(db.Integer, nullable=True)  # File size in bytes
     
+    # Whole-file deduplication
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # sha256 of the uploaded bytes
+    embedding_model = db.Column(db.String(100), nullable=True)  # Model that produced the document's vectors
+    embedding_dimension = db.Column(db.Integer, nullable=True)
+    source_document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=True)  # Original whose file/vectors this upload reuses
+    ref_count = db.Column(db.Integer, nullable=False, default=1)  # Uploads (incl. itself) referencing this original
+    
+    # Background ingestion tracking
+    job_id = db.Column(db.String(36), nullable=True, unique=True, index=True)
+    batch_id = db.Column(db.String(36), nullable=True, index=True)  # Bulk upload this file arrived in
+    status = db.Column(db.String(20), nullable=False, default='ready')  # 'pending', 'extracting', 'embedding', 'ready', 'updating', 'failed', 'deleted'
+    progress = db.Column(db.Integer, nullable=False, default=100)  # Percent complete
+    error_message = db.Column(db.Text, nullable=True)
+    
     def to_dict(self):
         """Convert document to dictionary"""
         return {
@@ -20,5 +34,12 @@ class Document(db.Model):
             'filename': self.filename,
             'user_id': self.user_id,
             'uploaded_at': self.uploaded_at.isoformat(),
-            'file_size': self.file_size
+            'file_size': self.file_size,
+            'job_id': self.job_id,
+            'batch_id': self.batch_id,
+            'embedding_model': self.embedding_model,
+            'embedding_dimension': self.embedding_dimension,
+            'status': self.status,
+            'progress': self.progress,
+            'error_message': self.error_message
         }
@@ -0,0 +1,140 @@
+import hashlib
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def document_set_version(documents):
+    """
+    Version string of the documents an answer was generated from
+
+    Built from the vectors each document points at (deduplicated uploads
+    share their original's), the uploaded bytes and the embedding model, so
+    it changes whenever a document is added, deleted, replaced or
+    re-embedded, and is identical for users holding the same documents.
+    """
+    parts = sorted({
+        f"{doc.source_document_id or doc.id}:{doc.content_hash}:{doc.embedding_model}"
+        for doc in documents
+    })
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class AnswerCache:
+    """
+    Thread-safe semantic cache of RAG answers.
+    Entries are scoped by (document-set version, chat model, embedding
+    model); within a scope a question is answered from the cache when its
+    embedding is within `threshold` cosine similarity of a cached one.
+    Uploads and deletions change the document-set version, so stale
+    answers are never matched and age out through the TTL and LRU limits.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()  # entry id -> (scope, embedding, response, document ids, created)
+        self._scopes = {}              # scope -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, entry_id):
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._scopes[scope]
+        ids.discard(entry_id)
+        if not ids:
+            del self._scopes[scope]
+
+    def get(self, scope, embedding):
+        """
+        Cached response for the closest question in scope, if close enough
+
+        Args:
+            scope: Tuple of (document-set version, chat model, embedding model)
+            embedding: Query embedding
+
+        Returns:
+            dict: Cached response, or None on a miss
+        """
+        query = _normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_similarity = None, self.threshold
+            for entry_id in list(self._scopes.get(scope, ())):
+                _, cached, _, _, created = self._entries[entry_id]
+                if now - created > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                similarity = sum(a * b for a, b in zip(query, cached))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return dict(self._entries[best_id][2])
+
+    def put(self, scope, embedding, response, document_ids=()):
+        """
+        Cache a response for a question
+
+        Args:
+            scope: Tuple of (document-set version, chat model, embedding model)
+            embedding: Query embedding
+            response: Response dict to return on later hits
+            document_ids: Documents the answer drew on, for invalidate_documents
+        """
+        entry_id = next(self._ids)
+        with self._lock:
+            self._entries[entry_id] = (
+                scope, _normalize(embedding), dict(response), frozenset(document_ids), time.monotonic()
+            )
+            self._scopes.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_documents(self, document_ids):
+        """Drop every entry drawing on any of the given documents"""
+        document_ids = set(document_ids)
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if entry[3] & document_ids
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """Hit/miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,197 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+
+class BatchEmbedder:
+    """
+    Rate-limit-aware batch embedding.
+    Texts are embedded in fixed-size batches on a bounded pool shared by
+    every ingestion job. The number of concurrent requests adapts AIMD-style:
+    it halves whenever the provider throttles (HTTP 429) and creeps back up
+    on success, so large corpora run at the quota without tripping it.
+    When a cache is given, chunks already embedded with the same model are
+    served from it and never sent to the provider.
+    """
+
+    TRANSIENT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+    def __init__(self, embeddings, batch_size=256, max_in_flight=4, max_retries=6,
+                 base_backoff=1.0, max_backoff=60.0, cache=None, model=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='embed-batch')
+        self._condition = threading.Condition()
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        self._stats = {
+            'chunks_embedded': 0,
+            'batches': 0,
+            'throttled_requests': 0,
+            'retries': 0,
+            'embedding_seconds': 0.0,
+            'last_chunks_per_second': 0.0
+        }
+
+    @staticmethod
+    def _is_rate_limit(error):
+        return isinstance(error, openai.RateLimitError) or getattr(error, 'status_code', None) == 429
+
+    @staticmethod
+    def _retry_after(error):
+        """Server-suggested delay in seconds, if the error carries one"""
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        try:
+            return float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+
+    def _acquire(self):
+        with self._condition:
+            while self._in_flight >= max(1, int(self._limit)):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def _release(self, throttled):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(1.0, self._limit / 2)
+            else:
+                self._limit = min(float(self.max_in_flight), self._limit + 1.0 / self._limit)
+            self._condition.notify_all()
+
+    def _call_with_backoff(self, fn, *args):
+        """Run one embedding request, backing off on throttling and transient errors"""
+        attempt = 0
+        while True:
+            self._acquire()
+            throttled = False
+            error = None
+            try:
+                return fn(*args)
+            except Exception as e:
+                throttled = self._is_rate_limit(e)
+                if not (throttled or isinstance(e, self.TRANSIENT_ERRORS)) or attempt >= self.max_retries:
+                    raise
+                error = e
+            finally:
+                self._release(throttled)
+
+            delay = self._retry_after(error)
+            if delay is None:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+            with self._condition:
+                self._stats['retries'] += 1
+                if throttled:
+                    self._stats['throttled_requests'] += 1
+
+            time.sleep(delay)
+            attempt += 1
+
+    def embed_query(self, text):
+        """Embed a single query string"""
+        return self._call_with_backoff(self.embeddings.embed_query, text)
+
+    def embed_documents(self, texts, progress_callback=None):
+        """
+        Embed texts in concurrent batches, reusing cached vectors
+
+        Args:
+            texts: List of texts
+            progress_callback: Optional callable(done, total), called from the caller's thread
+
+        Returns:
+            list: One vector per text, in input order
+        """
+        if not texts:
+            return []
+
+        vectors = {}
+        if self.cache is not None:
+            hashes = [self.cache.text_hash(text) for text in texts]
+            cached = self.cache.get_many(self.model, hashes)
+            vectors = {text: cached[text_hash] for text, text_hash in zip(texts, hashes) if text_hash in cached}
+
+        # Identical chunks are embedded once
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        reused = sum(1 for text in texts if text in vectors)
+
+        def report(done, total):
+            if progress_callback:
+                progress_callback(reused + (len(texts) - reused) * done // total, len(texts))
+
+        if reused:
+            report(0, 1)
+
+        if missing:
+            embedded = self._embed_batches(missing, report)
+            vectors.update(zip(missing, embedded))
+            if self.cache is not None:
+                self.cache.put_many(
+                    self.model,
+                    ((self.cache.text_hash(text), vector) for text, vector in zip(missing, embedded))
+                )
+
+        return [vectors[text] for text in texts]
+
+    def _embed_batches(self, texts, progress_callback):
+        """Send texts to the provider in concurrent batches"""
+        start = time.monotonic()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = {
+            self.executor.submit(self._call_with_backoff, self.embeddings.embed_documents, batch): index
+            for index, batch in enumerate(batches)
+        }
+
+        results = [None] * len(batches)
+        done = 0
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                done += len(batches[index])
+                progress_callback(done, len(texts))
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._condition:
+            self._stats['chunks_embedded'] += len(texts)
+            self._stats['batches'] += len(batches)
+            self._stats['embedding_seconds'] += elapsed
+            self._stats['last_chunks_per_second'] = len(texts) / elapsed if elapsed else 0.0
+
+        return [vector for batch in results for vector in batch]
+
+    def stats(self):
+        """Throughput and throttling counters"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['chunks_per_second'] = (
+                stats['chunks_embedded'] / stats['embedding_seconds'] if stats['embedding_seconds'] else 0.0
+            )
+            stats['batch_size'] = self.batch_size
+            stats['concurrency_limit'] = int(self._limit)
+            stats['max_in_flight'] = self.max_in_flight
+            stats['in_flight'] = self._in_flight
+            return stats
+
+    def shutdown(self):
+        """Stop the batch pool"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
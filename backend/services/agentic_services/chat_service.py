@@ -2,13 +2,12 @@ import os
 import base64
 from typing import Optional, List
 import requests
-from langchain_openai import ChatOpenAI
-from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_core.messages import HumanMessage
 
 from models import db
 from models import ChatHistory
 from services.auth_services.auth_service import AuthService
+from services.agentic_services.client_registry import ClientRegistry
 from config import Config
 
 class ChatService:
@@ -16,19 +15,16 @@ class ChatService:
     
     def __init__(self):
         """Initialize chat service"""
-        if not Config.OPENAI_API_KEY:
-            raise ValueError('OpenAI API key not configured')
-        
-        # Initialize OpenAI model with vision support
-        self.llm = ChatOpenAI(
-            model=Config.OPENAI_MODEL,
-            openai_api_key=Config.OPENAI_API_KEY,
-            temperature=0.7
-        )
+        self.registry = ClientRegistry()
         
         # Initialize tools
         self.tools = self._initialize_tools()
     
+    @property
+    def llm(self):
+        """Shared OpenAI model with vision support"""
+        return self.registry.llm
+    
     def _initialize_tools(self):
         """Initialize available tools"""
         tools = {
@@ -51,11 +47,9 @@ class ChatService:
         return tools
     
     def _web_search(self, query: str) -> str:
-        """Web search using DuckDuckGo"""
+        """Web search using the shared, cached DuckDuckGo client"""
         try:
-            search = DuckDuckGoSearchRun()
-            result = search.run(query)
-            return result
+            return self.registry.search_tool.run(query)
         except Exception as e:
             return f"Search error: {str(e)}"
     
@@ -94,19 +88,8 @@ class ChatService:
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
     
-    def chat_with_tools(self, message, user_id, chat_history=None, images: Optional[List[str]] = None):
-        """
-        Chat with tool calling and vision support
-        
-        Args:
-            message: User message
-            user_id: User ID
-            chat_history: Previous chat history (list of dicts)
-            images: List of image paths or base64 encoded images
-            
-        Returns:
-            dict: Response with answer and tool calls
-        """
+    def _build_message_content(self, message, chat_history=None, images: Optional[List[str]] = None):
+        """Text (with recent history) and image parts of the user message"""
         # Build conversation context
         context = ""
         if chat_history:
@@ -168,8 +151,86 @@ class ChatService:
                             }
                         })
         
+        return message_content
+    
+    def _run_tools(self, message):
+        """Run the tools a text-only message asks for"""
+        tool_results = []
+        for tool_name, tool_info in self.tools.items():
+            if tool_name.lower() in message.lower():
+                # Extract potential input
+                if tool_name == "web_search" and "search" in message.lower():
+                    result = tool_info['func'](message)
+                    tool_results.append({
+                        'tool': tool_name,
+                        'input': message,
+                        'result': result
+                    })
+                elif tool_name == "api_call" and ("http://" in message or "https://" in message):
+                    words = message.split()
+                    url = [w for w in words if w.startswith(('http://', 'https://'))][0]
+                    result = tool_info['func'](url)
+                    tool_results.append({
+                        'tool': tool_name,
+                        'input': url,
+                        'result': result
+                    })
+        return tool_results
+    
+    @staticmethod
+    def _tool_prompt(message, tool_results):
+        """Prompt asking for an answer that incorporates the tool results"""
+        tool_context = "\n".join([
+            f"Tool: {tr['tool']}\nInput: {tr['input']}\nResult: {tr['result']}"
+            for tr in tool_results
+        ])
+        
+        return f"""Based on the tool results, answer the user's question:
+                    
+                    User question: {message}
+                    
+                    Tool results:
+                    {tool_context}
+                    
+                    Provide a comprehensive answer incorporating the tool results:"""
+    
+    @staticmethod
+    def _record_chat(user_id, message, answer, images, tool_results):
+        """Save a tool chat exchange to the chat history"""
+        chat_entry = ChatHistory(
+            user_id=user_id,
+            message=message,
+            response=answer,
+            chat_type='tool',
+            extra_metadata={
+                'tools_used': [tr['tool'] for tr in tool_results],
+                'has_images': bool(images),
+                'num_images': len(images) if images else 0,
+                'tool_results': [
+                    {'tool': tr['tool'], 'input': tr['input'][:200]}
+                    for tr in tool_results
+                ]
+            }
+        )
+        db.session.add(chat_entry)
+        db.session.commit()
+    
+    def chat_with_tools(self, message, user_id, chat_history=None, images: Optional[List[str]] = None):
+        """
+        Chat with tool calling and vision support
+        
+        Args:
+            message: User message
+            user_id: User ID
+            chat_history: Previous chat history (list of dicts)
+            images: List of image paths or base64 encoded images
+            
+        Returns:
+            dict: Response with answer and tool calls
+        """
+        message_content = self._build_message_content(message, chat_history, images)
+        
         # Track tools used
-        tools_used = []
         tool_results = []
         
         try:
@@ -182,45 +243,11 @@ class ChatService:
             
             # Check if tools are mentioned in the text message
             if not images:  # Only use tools for text-only queries
-                for tool_name, tool_info in self.tools.items():
-                    if tool_name.lower() in message.lower():
-                        # Extract potential input
-                        if tool_name == "web_search" and "search" in message.lower():
-                            result = tool_info['func'](message)
-                            tool_results.append({
-                                'tool': tool_name,
-                                'input': message,
-                                'result': result
-                            })
-                            tools_used.append(tool_name)
-                        elif tool_name == "api_call" and ("http://" in message or "https://" in message):
-                            words = message.split()
-                            url = [w for w in words if w.startswith(('http://', 'https://'))][0]
-                            result = tool_info['func'](url)
-                            tool_results.append({
-                                'tool': tool_name,
-                                'input': url,
-                                'result': result
-                            })
-                            tools_used.append(tool_name)
+                tool_results = self._run_tools(message)
                 
                 # Generate final response with tool results
                 if tool_results:
-                    tool_context = "\n".join([
-                        f"Tool: {tr['tool']}\nInput: {tr['input']}\nResult: {tr['result']}"
-                        for tr in tool_results
-                    ])
-                    
-                    final_prompt = f"""Based on the tool results, answer the user's question:
-                    
-                    User question: {message}
-                    
-                    Tool results:
-                    {tool_context}
-                    
-                    Provide a comprehensive answer incorporating the tool results:"""
-                    
-                    final_response = self.llm.invoke(final_prompt)
+                    final_response = self.llm.invoke(self._tool_prompt(message, tool_results))
                     answer = final_response.content
                 else:
                     answer = initial_answer
@@ -232,30 +259,60 @@ class ChatService:
             tool_results = []
         
         # Save chat history
-        chat_entry = ChatHistory(
-            user_id=user_id,
-            message=message,
-            response=answer,
-            chat_type='tool',
-            extra_metadata={
-                'tools_used': tools_used,
-                'has_images': bool(images),
-                'num_images': len(images) if images else 0,
-                'tool_results': [
-                    {'tool': tr['tool'], 'input': tr['input'][:200]}
-                    for tr in tool_results
-                ]
-            }
-        )
-        db.session.add(chat_entry)
-        db.session.commit()
+        self._record_chat(user_id, message, answer, images, tool_results)
         
         return {
             'answer': answer,
-            'tools_used': tools_used,
+            'tools_used': [tr['tool'] for tr in tool_results],
+            'tool_results': tool_results,
+            'has_images': bool(images)
+        }
+    
+    def stream_chat_with_tools(self, message, user_id, chat_history=None, images: Optional[List[str]] = None):
+        """
+        Chat with tool calling and vision support, streaming the answer
+        
+        Images are read before this returns, so temporary image files can be
+        removed as soon as it does. Tools run first (they only depend on the
+        message), so a single streamed completion answers either with the
+        tool results or directly.
+        
+        Args:
+            message: User message
+            user_id: User ID
+            chat_history: Previous chat history (list of dicts)
+            images: List of image paths or base64 encoded images
+            
+        Returns:
+            iterator: (event, data) pairs: one 'metadata' event with the tool
+            calls, 'token' events with answer text as it is generated, and a
+            final 'done' event with the whole answer
+        """
+        message_content = self._build_message_content(message, chat_history, images)
+        return self._stream_chat(message, user_id, message_content, images)
+    
+    def _stream_chat(self, message, user_id, message_content, images):
+        tool_results = self._run_tools(message) if not images else []
+        yield 'metadata', {
+            'tools_used': [tr['tool'] for tr in tool_results],
             'tool_results': tool_results,
             'has_images': bool(images)
         }
+        
+        if tool_results:
+            prompt = self._tool_prompt(message, tool_results)
+        else:
+            prompt = [HumanMessage(content=message_content)]
+        
+        parts = []
+        for chunk in self.llm.stream(prompt):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield 'token', {'content': chunk.content}
+        
+        answer = ''.join(parts)
+        self._record_chat(user_id, message, answer, images, tool_results)
+        yield 'done', {'answer': answer}
     
     def get_chat_history(self, user_id, chat_type=None, limit=50):
         """
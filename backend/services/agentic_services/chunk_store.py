@@ -0,0 +1,245 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_right
+
+from services.agentic_services.text_extraction import iter_chunks
+
+MAGIC = b'RAGCHNK1'
+# Extracted text is compressed in independent frames of about this many characters
+FRAME_CHARS = 256 * 1024
+SPAN = struct.Struct('<II')                # chunk (start, end) character offsets
+FOOTER = struct.Struct('<QQQQ8s')          # spans offset, chunk count, index offset, index length, magic
+
+
+class ChunkStore:
+    """
+    On-disk store of extracted text and chunk boundaries, one file per document.
+    Text is kept as independently zlib-compressed frames next to the block
+    provenance (page/paragraph/line), and chunk spans are a flat table of
+    character offsets. Files are read through mmap, so re-indexing touches
+    only the frames it needs instead of parsing the original upload again.
+
+    File layout::
+
+        MAGIC | text frames ... | chunk spans (<II per chunk) | index (zlib JSON) | footer
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, document_id):
+        """Store file of a document"""
+        return os.path.join(self.root, f"{document_id}.chunks")
+
+    def exists(self, document_id):
+        return os.path.exists(self.path_for(document_id))
+
+    def open(self, document_id):
+        """
+        Open a document's stored text and chunks
+
+        Raises:
+            ValueError: If nothing is stored for the document
+        """
+        path = self.path_for(document_id)
+        if not os.path.exists(path):
+            raise ValueError(f'No stored text for document {document_id}')
+        return StoredDocument(path)
+
+    def writer(self, document_id, chunk_size, chunk_overlap):
+        """Writer replacing a document's stored text once committed"""
+        return ChunkStoreWriter(self.path_for(document_id), chunk_size, chunk_overlap)
+
+    def staging_path_for(self, document_id):
+        """Store file of a new version of a document, until promote() swaps it in"""
+        return f"{self.path_for(document_id)}.next"
+
+    def promote(self, document_id):
+        """Replace a document's stored text with its staged new version"""
+        os.replace(self.staging_path_for(document_id), self.path_for(document_id))
+
+    def delete(self, document_id, staged=False):
+        try:
+            os.remove(self.staging_path_for(document_id) if staged else self.path_for(document_id))
+        except OSError:
+            pass
+
+
+class ChunkStoreWriter:
+    """
+    Streaming writer for one store file
+
+    Blocks and chunk spans are appended as they are produced; the file is
+    written under a temporary name and only replaces the previous store on
+    commit(), so readers never see a partial file.
+    """
+
+    def __init__(self, path, chunk_size, chunk_overlap):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        self._file = open(self.tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._pending = []
+        self._pending_chars = 0
+        self._chars = 0
+        self._frames = []           # [file offset, compressed length, first char]
+        self._blocks = []           # [first char, provenance]
+        self._spans = bytearray()
+
+    def add_block(self, text, provenance):
+        """Append a block exactly as iter_chunks sees it (text plus newline)"""
+        self._blocks.append([self._chars + self._pending_chars, provenance])
+        self._pending.append(text + '\n')
+        self._pending_chars += len(text) + 1
+        if self._pending_chars >= FRAME_CHARS:
+            self._flush_frame()
+
+    def add_chunk(self, start, end):
+        self._spans += SPAN.pack(start, end)
+
+    def _flush_frame(self):
+        if not self._pending:
+            return
+        data = zlib.compress(''.join(self._pending).encode('utf-8'))
+        self._frames.append([self._file.tell(), len(data), self._chars])
+        self._file.write(data)
+        self._chars += self._pending_chars
+        self._pending = []
+        self._pending_chars = 0
+
+    def commit(self):
+        """Write the chunk table and index, then atomically replace the store file"""
+        self._flush_frame()
+        spans_offset = self._file.tell()
+        self._file.write(self._spans)
+
+        index = zlib.compress(json.dumps({
+            'chars': self._chars,
+            'frames': self._frames,
+            'blocks': self._blocks,
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap
+        }).encode('utf-8'))
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(FOOTER.pack(spans_offset, len(self._spans) // SPAN.size, index_offset, len(index), MAGIC))
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Drop the partially written file"""
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def split_and_record(blocks, writer, chunk_size, chunk_overlap):
+    """
+    Split blocks into chunks while recording both in a store writer
+
+    Yields:
+        tuple: (chunk text, metadata), as iter_chunks
+    """
+    def recorded(blocks):
+        for text, provenance in blocks:
+            writer.add_block(text, provenance)
+            yield text, provenance
+
+    for text, metadata in iter_chunks(recorded(blocks), chunk_size, chunk_overlap):
+        start = metadata['start_index']
+        writer.add_chunk(start, start + len(text))
+        yield text, metadata
+
+
+class StoredDocument:
+    """Read-only, memory-mapped view of one store file"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        spans_offset, chunk_count, index_offset, index_length, magic = FOOTER.unpack_from(
+            self._map, len(self._map) - FOOTER.size
+        )
+        if magic != MAGIC or self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'Corrupt chunk store file: {path}')
+
+        index = json.loads(zlib.decompress(self._map[index_offset:index_offset + index_length]))
+        self.chars = index['chars']
+        self.chunk_size = index['chunk_size']
+        self.chunk_overlap = index['chunk_overlap']
+        self.chunk_count = chunk_count
+        self._frames = index['frames']
+        self._frame_starts = [frame[2] for frame in self._frames]
+        self._blocks = index['blocks']
+        self._block_starts = [block[0] for block in self._blocks]
+        self._spans_offset = spans_offset
+        self._cached_frame = (None, '')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _frame_text(self, number):
+        if self._cached_frame[0] != number:
+            offset, length, _ = self._frames[number]
+            self._cached_frame = (number, zlib.decompress(self._map[offset:offset + length]).decode('utf-8'))
+        return self._cached_frame[1]
+
+    def text(self, start, end):
+        """Extracted text between two character offsets, decompressing only the frames it spans"""
+        parts = []
+        number = max(0, bisect_right(self._frame_starts, start) - 1)
+        while start < end and number < len(self._frames):
+            frame_start = self._frames[number][2]
+            frame = self._frame_text(number)
+            piece = frame[start - frame_start:end - frame_start]
+            parts.append(piece)
+            start += len(piece)
+            number += 1
+        return ''.join(parts)
+
+    def provenance(self, offset):
+        """Provenance of the block containing a character offset"""
+        if not self._blocks:
+            return {}
+        return self._blocks[max(0, bisect_right(self._block_starts, offset) - 1)][1]
+
+    def blocks(self):
+        """
+        Replay the extracted blocks in order, as open_text_blocks produced them
+
+        Yields:
+            tuple: (text, provenance)
+        """
+        for number, (start, provenance) in enumerate(self._blocks):
+            end = self._blocks[number + 1][0] if number + 1 < len(self._blocks) else self.chars
+            # Blocks were stored with a trailing newline
+            yield self.text(start, end)[:-1], provenance
+
+    def chunks(self):
+        """
+        Stored chunks with the same text and metadata as at ingestion time
+
+        Yields:
+            tuple: (chunk text, metadata)
+        """
+        for number in range(self.chunk_count):
+            start, end = SPAN.unpack_from(self._map, self._spans_offset + number * SPAN.size)
+            yield self.text(start, end), {**self.provenance(start), 'start_index': start}
@@ -0,0 +1,304 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import httpx
+from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_community.tools import DuckDuckGoSearchRun
+
+from services.agentic_services.query_embedding_cache import QueryEmbeddingCache
+from services.agentic_services.context_packer import ContextPacker
+from services.agentic_services.ingestion_pipeline import IngestionPipeline
+from services.agentic_services.extraction_pool import ExtractionPool
+from services.agentic_services.chunk_store import ChunkStore
+from services.agentic_services.embedding_migration import EmbeddingMigration
+from services.agentic_services.batch_embedder import BatchEmbedder
+from services.agentic_services.embedding_cache import EmbeddingCache
+from services.agentic_services.local_embeddings import LocalEmbeddings, LOCAL_PREFIX, is_local_model
+from services.agentic_services.vector_codec import split_embedding_model
+from services.agentic_services.vector_store import ChromaVectorStore
+from services.agentic_services.lexical_index import LexicalIndex
+from services.agentic_services.answer_cache import AnswerCache
+from services.agentic_services.search_client import WebSearchClient
+from config import Config
+
+
+class ClientRegistry:
+    """
+    Singleton registry of long-lived AI clients.
+    Each client is built lazily once per worker process and shared by every
+    request thread, so HTTP keep-alive pools and the Chroma client survive
+    between requests.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(ClientRegistry, cls).__new__(cls)
+                    instance._clients = {}
+                    instance._lock = threading.RLock()
+                    cls._instance = instance
+        return cls._instance
+
+    def _get_or_create(self, name, factory):
+        """Return the named client, building it under the registry lock if missing"""
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = factory()
+                    self._clients[name] = client
+        return client
+
+    @staticmethod
+    def _require_openai_key():
+        if not Config.OPENAI_API_KEY:
+            raise ValueError('OpenAI API key not configured')
+
+    @property
+    def http_client(self):
+        """Shared keep-alive HTTP pool used by every OpenAI client"""
+        return self._get_or_create('http_client', lambda: httpx.Client(
+            limits=httpx.Limits(
+                max_connections=Config.OPENAI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.OPENAI_HTTP_MAX_KEEPALIVE
+            ),
+            timeout=Config.OPENAI_HTTP_TIMEOUT_SECONDS
+        ))
+
+    @property
+    def embeddings(self):
+        """Embeddings client for the configured EMBEDDING_MODEL"""
+        return self.embeddings_for(Config.EMBEDDING_MODEL)
+
+    def embeddings_for(self, model):
+        """
+        Embeddings client for a model spec ('name' or 'name@dimensions')
+
+        Names starting with 'local:' run a sentence-transformers model on this
+        machine; any other name is an OpenAI embedding model.
+        """
+        def factory():
+            name, dimensions = split_embedding_model(model)
+            if is_local_model(name):
+                return LocalEmbeddings(
+                    name[len(LOCAL_PREFIX):],
+                    dimensions=dimensions,
+                    device=Config.LOCAL_EMBEDDING_DEVICE,
+                    batch_size=Config.LOCAL_EMBEDDING_BATCH_SIZE,
+                    workers=Config.LOCAL_EMBEDDING_WORKERS,
+                    cache_dir=Config.LOCAL_EMBEDDING_CACHE_DIR,
+                    torch_threads=Config.LOCAL_EMBEDDING_TORCH_THREADS
+                )
+            self._require_openai_key()
+            # Retries are handled by BatchEmbedder so throttling can adapt concurrency
+            return OpenAIEmbeddings(
+                model=name,
+                dimensions=dimensions,
+                openai_api_key=Config.OPENAI_API_KEY,
+                chunk_size=Config.EMBEDDING_BATCH_SIZE,
+                max_retries=0,
+                http_client=self.http_client
+            )
+        return self._get_or_create(f'embeddings:{model}', factory)
+
+    @property
+    def batch_embedder(self):
+        """Throttle-aware batch embedding for the configured EMBEDDING_MODEL"""
+        return self.batch_embedder_for(Config.EMBEDDING_MODEL)
+
+    def batch_embedder_for(self, model):
+        """
+        Throttle-aware batch embedding for a given model
+
+        Documents keep the model they were indexed with, so queries against
+        older collections (and re-embedding migrations) need more than one.
+        """
+        # A local model is already saturated by one batch per worker process
+        local = is_local_model(split_embedding_model(model)[0])
+        return self._get_or_create(f'batch_embedder:{model}', lambda: BatchEmbedder(
+            self.embeddings_for(model),
+            batch_size=Config.EMBEDDING_BATCH_SIZE,
+            max_in_flight=max(1, Config.LOCAL_EMBEDDING_WORKERS) if local else Config.EMBEDDING_MAX_IN_FLIGHT,
+            max_retries=Config.EMBEDDING_MAX_RETRIES,
+            cache=self.embedding_cache if Config.EMBEDDING_CACHE_ENABLED else None,
+            model=model
+        ))
+
+    @property
+    def embedding_cache(self):
+        """On-disk chunk embedding cache"""
+        return self._get_or_create('embedding_cache', lambda: EmbeddingCache(
+            Config.EMBEDDING_CACHE_PATH,
+            max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES
+        ))
+
+    @property
+    def llm(self):
+        """OpenAI chat model"""
+        def factory():
+            self._require_openai_key()
+            return ChatOpenAI(
+                model=Config.OPENAI_MODEL,
+                openai_api_key=Config.OPENAI_API_KEY,
+                temperature=0.7,
+                http_client=self.http_client
+            )
+        return self._get_or_create('llm', factory)
+
+    @property
+    def chroma_client(self):
+        """Persistent Chroma client"""
+        return self._get_or_create('chroma_client', lambda: chromadb.PersistentClient(
+            path=Config.CHROMA_DB_PATH
+        ))
+
+    @property
+    def vector_store(self):
+        """Chunk vector storage for the configured VECTOR_STORE_BACKEND"""
+        def factory():
+            if Config.VECTOR_STORE_BACKEND == 'faiss':
+                from services.agentic_services.faiss_vector_store import FaissVectorStore
+                return FaissVectorStore(
+                    Config.FAISS_INDEX_PATH,
+                    index_type=Config.FAISS_INDEX_TYPE,
+                    hnsw_m=Config.FAISS_HNSW_M,
+                    hnsw_ef_search=Config.FAISS_HNSW_EF_SEARCH,
+                    ivf_nlist=Config.FAISS_IVF_NLIST,
+                    ivf_nprobe=Config.FAISS_IVF_NPROBE,
+                    compact_ratio=Config.FAISS_COMPACT_RATIO,
+                    flush_seconds=Config.FAISS_FLUSH_SECONDS,
+                    max_open=Config.FAISS_MAX_OPEN_COLLECTIONS,
+                    vector_dtype=Config.FAISS_VECTOR_DTYPE,
+                    rescore_factor=Config.FAISS_RESCORE_FACTOR
+                )
+            if Config.VECTOR_STORE_BACKEND != 'chroma':
+                raise ValueError(f'Unsupported vector store backend: {Config.VECTOR_STORE_BACKEND}')
+            return ChromaVectorStore(self.chroma_client, batch_size=Config.EMBEDDING_BATCH_SIZE)
+        return self._get_or_create('vector_store', factory)
+
+    @property
+    def lexical_index(self):
+        """BM25 keyword index of chunk text for hybrid retrieval"""
+        return self._get_or_create('lexical_index', lambda: LexicalIndex(Config.LEXICAL_INDEX_PATH))
+
+    @property
+    def answer_cache(self):
+        """Semantic cache of RAG answers"""
+        return self._get_or_create('answer_cache', lambda: AnswerCache(
+            max_entries=Config.RAG_ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=Config.RAG_ANSWER_CACHE_TTL_SECONDS,
+            threshold=Config.RAG_ANSWER_CACHE_THRESHOLD
+        ))
+
+    @property
+    def search_tool(self):
+        """DuckDuckGo web search, shared and cached across services"""
+        return self._get_or_create('search_tool', lambda: WebSearchClient(
+            DuckDuckGoSearchRun(),
+            ttl_seconds=Config.WEB_SEARCH_CACHE_TTL_SECONDS,
+            max_entries=Config.WEB_SEARCH_CACHE_MAX_ENTRIES
+        ))
+
+    @property
+    def query_embedding_cache(self):
+        """LRU of recent query embeddings"""
+        return self._get_or_create('query_embedding_cache', lambda: QueryEmbeddingCache(
+            max_entries=Config.RAG_QUERY_EMBEDDING_CACHE_SIZE
+        ))
+
+    @property
+    def retrieval_executor(self):
+        """Bounded thread pool for the per-collection retrieval fan-out"""
+        return self._get_or_create('retrieval_executor', lambda: ThreadPoolExecutor(
+            max_workers=Config.RAG_RETRIEVAL_WORKERS,
+            thread_name_prefix='rag-retrieval'
+        ))
+
+    @property
+    def search_executor(self):
+        """Thread pool running web searches alongside retrieval"""
+        return self._get_or_create('search_executor', lambda: ThreadPoolExecutor(
+            max_workers=Config.RAG_WEB_SEARCH_WORKERS,
+            thread_name_prefix='rag-search'
+        ))
+
+    @property
+    def context_packer(self):
+        """Token-budgeted prompt context assembler"""
+        return self._get_or_create('context_packer', lambda: ContextPacker(
+            model=Config.OPENAI_MODEL,
+            token_budget=Config.RAG_CONTEXT_TOKEN_BUDGET,
+            max_overlap_chars=Config.RAG_CHUNK_OVERLAP
+        ))
+
+    @property
+    def extraction_pool(self):
+        """Worker processes for CPU-bound document parsing"""
+        return self._get_or_create('extraction_pool', lambda: ExtractionPool(
+            max_workers=Config.INGESTION_EXTRACT_WORKERS,
+            max_queued=Config.EXTRACTION_MAX_QUEUED,
+            cpu_seconds=Config.EXTRACTION_CPU_SECONDS,
+            chunk_size=Config.RAG_CHUNK_SIZE,
+            chunk_overlap=Config.RAG_CHUNK_OVERLAP
+        ))
+
+    @property
+    def chunk_store(self):
+        """Persisted extracted text and chunk boundaries"""
+        return self._get_or_create('chunk_store', lambda: ChunkStore(Config.CHUNK_STORE_PATH))
+
+    @property
+    def embedding_migration(self):
+        """Background re-embedding into another embedding model"""
+        return self._get_or_create('embedding_migration', lambda: EmbeddingMigration(
+            chunks_per_second=Config.EMBEDDING_MIGRATION_CHUNKS_PER_SECOND
+        ))
+
+    @property
+    def ingestion_pipeline(self):
+        """Background document ingestion workers"""
+        return self._get_or_create('ingestion_pipeline', lambda: IngestionPipeline(
+            self.extraction_pool,
+            chunk_store=self.chunk_store if Config.CHUNK_STORE_ENABLED else None,
+            extract_workers=Config.INGESTION_EXTRACT_WORKERS,
+            embed_workers=Config.INGESTION_EMBED_WORKERS
+        ))
+
+    def warm_up(self):
+        """Build every client up front so the first request does not pay setup cost"""
+        for name in ('http_client', 'embeddings', 'llm', 'vector_store', 'search_tool'):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+
+    def shutdown(self):
+        """Close pooled connections, stop worker pools and drop every client"""
+        with self._lock:
+            for name, client in self._clients.items():
+                if isinstance(client, ThreadPoolExecutor):
+                    client.shutdown(wait=False, cancel_futures=True)
+                elif isinstance(client, (IngestionPipeline, ExtractionPool, BatchEmbedder, LocalEmbeddings)):
+                    client.shutdown()
+            vector_store = self._clients.get('vector_store')
+            if vector_store is not None:
+                try:
+                    vector_store.close()
+                except Exception as e:
+                    print(f"Error closing vector store: {e}")
+            for name in ('embedding_cache', 'lexical_index'):
+                client = self._clients.get(name)
+                if client is not None:
+                    client.close()
+            http_client = self._clients.get('http_client')
+            if http_client is not None:
+                try:
+                    http_client.close()
+                except Exception as e:
+                    print(f"Error closing HTTP client: {e}")
+            self._clients = {}
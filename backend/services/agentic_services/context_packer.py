@@ -0,0 +1,128 @@
+import tiktoken
+
+# Shortest shared text treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 40
+SEPARATOR = "\n\n"
+
+
+class ContextPacker:
+    """
+    Token-budgeted context assembler for RAG prompts.
+    Merges chunks of the same document whose text overlaps (neighbouring
+    splitter windows), then packs the highest-scoring pieces until the
+    token budget is spent. A best piece that alone exceeds the budget is
+    cut to fit rather than dropped.
+    """
+
+    def __init__(self, model, token_budget, max_overlap_chars):
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding('cl100k_base')
+        self.token_budget = token_budget
+        self.max_overlap_chars = max_overlap_chars
+
+    def count_tokens(self, text):
+        """Number of tokens in text for the configured model"""
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _overlap(self, left, right):
+        """Length of the longest suffix of left that is a prefix of right"""
+        if len(right) < MIN_OVERLAP_CHARS:
+            return 0
+        probe = right[:MIN_OVERLAP_CHARS]
+        start = max(0, len(left) - self.max_overlap_chars - MIN_OVERLAP_CHARS)
+        index = left.find(probe, start)
+        while index != -1:
+            if right.startswith(left[index:]):
+                return len(left) - index
+            index = left.find(probe, index + 1)
+        return 0
+
+    def _truncate(self, text, max_tokens):
+        """Longest leading part of text that is at most max_tokens tokens"""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        limit = max_tokens
+        while limit > 0:
+            # Decoding a token prefix can re-encode to a few more tokens
+            truncated = self.encoding.decode(tokens[:limit])
+            if self.count_tokens(truncated) <= max_tokens:
+                return truncated
+            limit -= 1
+        return 
+
+    def _merge(self, segment, text):
+        """Merge text into segment if they overlap; return the merged text or None"""
+        if text in segment:
+            return segment
+        if segment in text:
+            return text
+        overlap = self._overlap(segment, text)
+        if overlap:
+            return segment + text[overlap:]
+        overlap = self._overlap(text, segment)
+        if overlap:
+            return text + segment[overlap:]
+        return None
+
+    def pack(self, chunks):
+        """
+        Assemble prompt context from ranked chunks
+
+        Args:
+            chunks: RetrievedChunk list, best first
+
+        Returns:
+            tuple: (context text, packing report)
+        """
+        # Merge overlapping chunks of the same document into segments,
+        # keeping each segment at the rank of its best chunk; chunks without
+        # a document_id (legacy collections) are never merged
+        segments = []
+        merged = 0
+        for chunk in chunks:
+            text = chunk.document.page_content
+            source = chunk.document.metadata.get('document_id')
+            for segment in segments:
+                if source is None or segment['source'] != source:
+                    continue
+                combined = self._merge(segment['text'], text)
+                if combined is not None:
+                    segment['text'] = combined
+                    segment['chunks'] += 1
+                    merged += 1
+                    break
+            else:
+                segments.append({'source': source, 'text': text, 'chunks': 1})
+
+        # Greedily pack segments by rank until the budget is used up
+        separator_tokens = self.count_tokens(SEPARATOR)
+        used_tokens = 0
+        packed = []
+        chunks_used = 0
+        truncated = False
+        for segment in segments:
+            text = segment['text']
+            tokens = self.count_tokens(text) + (separator_tokens if packed else 0)
+            if used_tokens + tokens > self.token_budget:
+                if packed:
+                    continue
+                # The best segment alone is over budget: keep its beginning
+                text = self._truncate(text, self.token_budget)
+                if not text:
+                    continue
+                tokens = self.count_tokens(text)
+                truncated = True
+            packed.append(text)
+            used_tokens += tokens
+            chunks_used += segment['chunks']
+
+        return SEPARATOR.join(packed), {
+            'context_tokens': used_tokens,
+            'token_budget': self.token_budget,
+            'chunks_retrieved': len(chunks),
+            'chunks_merged': merged,
+            'chunks_used': chunks_used,
+            'truncated': truncated,
+            'chunks_dropped': len(chunks) - chunks_used
+        }
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of chunk embeddings.
+    Vectors are keyed by (embedding model, sha256 of the chunk text) in a
+    SQLite file shared by every worker, so re-uploads and documents shared
+    between users are only embedded once. The least recently used entries
+    are evicted once the cache grows past max_entries.
+    """
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' model TEXT NOT NULL,'
+            ' text_hash TEXT NOT NULL,'
+            ' vector BLOB NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (model, text_hash))'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)')
+        self._connection.commit()
+        self._entries = self._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    @staticmethod
+    def text_hash(text):
+        """sha256 hex digest of a chunk"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, model, hashes):
+        """
+        Look up cached vectors
+
+        Args:
+            model: Embedding model name
+            hashes: Chunk text hashes
+
+        Returns:
+            dict: text hash -> vector for every hit
+        """
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._connection.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})',
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, vector in rows:
+                    values = array('f')
+                    values.frombytes(vector)
+                    found[text_hash] = values.tolist()
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?',
+                    [(now, model, text_hash) for text_hash in found]
+                )
+                self._connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model, items):
+        """
+        Store vectors
+
+        Args:
+            model: Embedding model name
+            items: Iterable of (text hash, vector)
+        """
+        now = time.time()
+        rows = [
+            (model, text_hash, array('f', vector).tobytes(), now)
+            for text_hash, vector in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._entries += self._connection.total_changes - before
+            self._connection.commit()
+
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries down to max_entries (caller holds the lock)"""
+        # Other workers write to the same file, so recount before evicting
+        self._entries = self._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        excess = self._entries - self.max_entries
+        if excess <= 0:
+            return
+
+        self._connection.execute(
+            'DELETE FROM embeddings WHERE rowid IN '
+            '(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)',
+            (excess,)
+        )
+        self._connection.commit()
+        self._entries -= excess
+        self.evictions += excess
+
+    def stats(self):
+        """Hit/miss and size counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self._entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            self._connection.close()
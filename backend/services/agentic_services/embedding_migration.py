@@ -0,0 +1,169 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from models import db
+from models import Document
+from config import Config
+
+
+class EmbeddingMigration:
+    """
+    Throttled background re-embedding of the corpus into another model.
+    Documents are migrated one at a time into collections for the target
+    model while queries keep reading the old ones (see
+    RAGService.reembed_document); each document switches over in a single
+    commit. Chunks come from the chunk store when available, otherwise the
+    upload is parsed once in the extraction pool. Embedding throughput is
+    capped at chunks_per_second so live ingestion keeps most of the quota.
+    """
+
+    def __init__(self, chunks_per_second=100):
+        self.chunks_per_second = chunks_per_second
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+        self._next_slot = 0.0
+        self._state = {'status': 'idle'}
+
+    def start(self, app, model):
+        """
+        Start migrating every ready document to model in a background thread
+
+        Args:
+            app: Flask application, used to open an app context in the worker
+            model: Target embedding model
+
+        Returns:
+            dict: Migration status
+
+        Raises:
+            ValueError: If a migration is already running
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise ValueError('An embedding migration is already running')
+            self._cancel.clear()
+            self._state = self._initial_state(model)
+            self._thread = threading.Thread(
+                target=self.run, args=(app, model), name='embedding-migration', daemon=True
+            )
+            self._thread.start()
+        return self.status()
+
+    def cancel(self):
+        """Stop after the document currently being migrated"""
+        self._cancel.set()
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            state = dict(self._state)
+            state['failed_documents'] = list(state.get('failed_documents', []))
+            return state
+
+    @staticmethod
+    def _initial_state(model):
+        return {
+            'status': 'running',
+            'target_model': model,
+            'started_at': datetime.utcnow().isoformat(),
+            'finished_at': None,
+            'total_documents': 0,
+            'migrated_documents': 0,
+            'skipped_documents': 0,
+            'chunks_embedded': 0,
+            'current_document_id': None,
+            'failed_documents': []
+        }
+
+    def _set(self, **values):
+        with self._lock:
+            self._state.update(values)
+
+    def _throttle(self, chunks):
+        """Sleep so that the average rate stays under chunks_per_second"""
+        with self._lock:
+            self._state['chunks_embedded'] += chunks
+            if not self.chunks_per_second:
+                return
+            now = time.monotonic()
+            self._next_slot = max(self._next_slot, now) + chunks / self.chunks_per_second
+            delay = self._next_slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _document_chunks(self, registry, document):
+        """Stored chunks of a document, parsing the upload once if none are stored"""
+        store = registry.chunk_store
+        if store.exists(document.id):
+            with store.open(document.id) as stored:
+                yield from stored.chunks()
+            return
+
+        ext = document.filename.rsplit('.', 1)[-1].lower()
+        store_path = store.path_for(document.id) if Config.CHUNK_STORE_ENABLED else None
+        extraction = registry.extraction_pool.submit(document.filepath, ext, wait=True, store_path=store_path)
+        for text, metadata, _ in extraction.chunks():
+            yield text, metadata
+
+    def run(self, app, model):
+        """Migrate every ready document to model (blocking)"""
+        from services.agentic_services.rag_service import RAGService
+
+        with self._lock:
+            if self._state.get('status') != 'running' or self._state.get('target_model') != model:
+                self._state = self._initial_state(model)
+
+        with app.app_context():
+            try:
+                self._migrate(RAGService.get_instance(), model)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Embedding migration to {model} failed: {e}")
+                self._set(status='failed', error=str(e), current_document_id=None,
+                          finished_at=datetime.utcnow().isoformat())
+
+    def _migrate(self, rag_service, model):
+        """Migrate documents one by one, recording progress in the status"""
+        # Deduplicated uploads follow their source document
+        document_ids = [
+            document_id for (document_id,) in db.session.query(Document.id).filter(
+                Document.source_document_id.is_(None),
+                Document.status == 'ready',
+                or_(Document.embedding_model.is_(None), Document.embedding_model != model)
+            ).order_by(Document.id)
+        ]
+        self._set(total_documents=len(document_ids))
+        print(f"Migrating {len(document_ids)} documents to {model}...")
+
+        for document_id in document_ids:
+            if self._cancel.is_set():
+                self._set(status='cancelled', current_document_id=None, finished_at=datetime.utcnow().isoformat())
+                return
+
+            document = Document.query.get(document_id)
+            if document is None or document.status != 'ready' or document.embedding_model == model:
+                with self._lock:
+                    self._state['skipped_documents'] += 1
+                continue
+
+            self._set(current_document_id=document_id)
+            try:
+                rag_service.reembed_document(
+                    document, model, self._document_chunks(rag_service.registry, document), throttle=self._throttle
+                )
+            except Exception as e:
+                db.session.rollback()
+                print(f"Embedding migration of document {document_id} failed: {e}")
+                with self._lock:
+                    self._state['failed_documents'].append({'document_id': document_id, 'error': str(e)})
+                continue
+
+            with self._lock:
+                self._state['migrated_documents'] += 1
+
+        self._set(status='completed', current_document_id=None, finished_at=datetime.utcnow().isoformat())
+        print(f"✓ Embedding migration to {model} complete")
@@ -0,0 +1,283 @@
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; CPU limits are skipped there
+    resource = None
+
+from services.agentic_services.text_extraction import open_text_blocks, iter_chunks
+from services.agentic_services.chunk_store import ChunkStoreWriter, split_and_record
+
+# How often a follower polls the chunk file while the worker is still writing
+FOLLOW_POLL_SECONDS = 0.05
+
+
+class ExtractionTimeout(Exception):
+    """Raised inside a worker process when a file exceeds its CPU time budget"""
+
+
+def _on_cpu_limit(signum, frame):
+    raise ExtractionTimeout('CPU time limit exceeded')
+
+
+def _cpu_seconds_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_limit(cpu_seconds):
+    """Arm a soft RLIMIT_CPU relative to what this worker has already used"""
+    if resource is None or not cpu_seconds:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(_cpu_seconds_used() + cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _clear_cpu_limit():
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def extract_chunks_to_file(filepath, ext, out_path, chunk_size, chunk_overlap, cpu_seconds, store_path=None):
+    """
+    Worker entry point: parse and split a document into a JSON-lines file
+
+    Each line is [chunk text, metadata, fraction of blocks parsed or null].
+    Lines are flushed as they are written so the parent can follow the file
+    while parsing is still in progress. When store_path is given, the
+    extracted text and chunk boundaries are also persisted there.
+
+    Returns:
+        tuple: (chunk count, seconds spent in the worker)
+    """
+    started = time.monotonic()
+    _set_cpu_limit(cpu_seconds)
+    try:
+        blocks, total = open_text_blocks(filepath, ext)
+        consumed = 0
+
+        def counted(blocks):
+            nonlocal consumed
+            for block in blocks:
+                consumed += 1
+                yield block
+
+        writer = ChunkStoreWriter(store_path, chunk_size, chunk_overlap) if store_path else None
+        if writer:
+            chunks = split_and_record(counted(blocks), writer, chunk_size, chunk_overlap)
+        else:
+            chunks = iter_chunks(counted(blocks), chunk_size, chunk_overlap)
+
+        count = 0
+        try:
+            with open(out_path, 'w', encoding='utf-8', buffering=1) as out:
+                for text, metadata in chunks:
+                    out.write(json.dumps([text, metadata, consumed / total if total else None]) + '\n')
+                    count += 1
+        except BaseException:
+            if writer:
+                writer.abort()
+            raise
+        if writer:
+            writer.commit()
+        return count, time.monotonic() - started
+    finally:
+        _clear_cpu_limit()
+
+
+class ExtractionJob:
+    """Handle on one document being parsed in the process pool"""
+
+    def __init__(self, future, out_path):
+        self.future = future
+        self.out_path = out_path
+
+    def chunks(self):
+        """
+        Follow the worker's output as it is written
+
+        Yields:
+            tuple: (chunk text, metadata, fraction of the document parsed or None)
+
+        Raises:
+            ValueError: If the worker failed, crashed or ran out of CPU time
+        """
+        try:
+            with open(self.out_path, 'r', encoding='utf-8') as f:
+                pending = ''
+                while True:
+                    finished = self.future.done()
+                    line = f.readline()
+                    while line:
+                        pending += line
+                        if pending.endswith('\n'):
+                            text, metadata, fraction = json.loads(pending)
+                            yield text, metadata, fraction
+                            pending = ''
+                        line = f.readline()
+                    if finished:
+                        break
+                    time.sleep(FOLLOW_POLL_SECONDS)
+
+            error = self.future.exception()
+            if isinstance(error, ExtractionTimeout):
+                raise ValueError('Document took too long to parse')
+            if isinstance(error, BrokenProcessPool):
+                raise ValueError('Document parser crashed')
+            if error is not None:
+                raise error
+        finally:
+            self.close()
+
+    def close(self):
+        """Remove the chunk file"""
+        try:
+            os.remove(self.out_path)
+        except OSError:
+            pass
+
+
+class ExtractionPool:
+    """
+    Process pool for CPU-bound document parsing.
+    PDF/DOCX parsing is pure Python and holds the GIL, so it runs in
+    separate worker processes. Submissions are bounded (workers plus a
+    small queue) and rejected once full, each file gets a CPU time budget,
+    and a worker that crashes on a malformed file only breaks the pool,
+    which is rebuilt for the next submission.
+    """
+
+    def __init__(self, max_workers=2, max_queued=8, cpu_seconds=120, chunk_size=1000, chunk_overlap=200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.cpu_seconds = cpu_seconds
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._stopped = False
+        self._context = multiprocessing.get_context('spawn')
+        self._executor = self._create_executor()
+        self._started = time.monotonic()
+        self._in_flight = 0
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'crashed': 0,
+            'rejected': 0,
+            'restarts': 0,
+            'busy_seconds': 0.0
+        }
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+
+    def submit(self, filepath, ext, wait=False, store_path=None):
+        """
+        Queue a document for parsing
+
+        Args:
+            filepath: Path of the stored upload
+            ext: File extension
+            wait: Block until the queue has room instead of rejecting the file
+            store_path: Optional chunk store file to persist the extracted text to
+
+        Returns:
+            ExtractionJob: Handle to follow the chunks as they are produced
+
+        Raises:
+            ValueError: If the extraction queue is full (or the pool is shut down)
+        """
+        with self._lock:
+            while wait and not self._stopped and self._in_flight >= self.max_workers + self.max_queued:
+                self._capacity.wait(timeout=1.0)
+            if self._stopped:
+                raise ValueError('Extraction pool is shut down')
+            if self._in_flight >= self.max_workers + self.max_queued:
+                self._stats['rejected'] += 1
+                raise ValueError('Too many documents are being processed, please try again shortly')
+
+            fd, out_path = tempfile.mkstemp(prefix='extract-', suffix='.jsonl')
+            os.close(fd)
+            executor = self._executor
+            try:
+                future = executor.submit(
+                    extract_chunks_to_file, filepath, ext, out_path,
+                    self.chunk_size, self.chunk_overlap, self.cpu_seconds, store_path
+                )
+            except BrokenProcessPool:
+                executor = self._restart(executor)
+                future = executor.submit(
+                    extract_chunks_to_file, filepath, ext, out_path,
+                    self.chunk_size, self.chunk_overlap, self.cpu_seconds, store_path
+                )
+            self._in_flight += 1
+            self._stats['submitted'] += 1
+
+        future.add_done_callback(lambda done: self._on_done(executor, done))
+        return ExtractionJob(future, out_path)
+
+    def _restart(self, broken):
+        """Replace a broken pool (caller holds the lock)"""
+        if self._executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            self._stats['restarts'] += 1
+        return self._executor
+
+    def _on_done(self, executor, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._in_flight -= 1
+            self._capacity.notify_all()
+            if future.cancelled():
+                self._stats['failed'] += 1
+            elif error is None:
+                self._stats['completed'] += 1
+                self._stats['busy_seconds'] += future.result()[1]
+            elif isinstance(error, ExtractionTimeout):
+                self._stats['timed_out'] += 1
+            elif isinstance(error, BrokenProcessPool):
+                self._stats['crashed'] += 1
+                self._restart(executor)
+            else:
+                self._stats['failed'] += 1
+
+    def stats(self):
+        """Pool size, queue depth and utilisation counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            uptime = time.monotonic() - self._started
+            stats['workers'] = self.max_workers
+            stats['max_queued'] = self.max_queued
+            stats['cpu_seconds_limit'] = self.cpu_seconds
+            stats['running'] = min(self._in_flight, self.max_workers)
+            stats['queued'] = max(0, self._in_flight - self.max_workers)
+            stats['utilisation'] = (
+                stats['busy_seconds'] / (self.max_workers * uptime) if uptime else 0.0
+            )
+            return stats
+
+    def shutdown(self):
+        """Stop the worker processes and drop queued documents"""
+        with self._lock:
+            self._stopped = True
+            self._capacity.notify_all()
+            self._executor.shutdown(wait=False, cancel_futures=True)
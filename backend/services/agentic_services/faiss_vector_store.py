@@ -0,0 +1,677 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from services.agentic_services.vector_store import VectorHit, VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks
+    fcntl = None
+
+INDEX_FILE = 'index.faiss'
+TABLE_FILE = 'chunks.db'
+LOCK_FILE = 'index.lock'
+
+_COLLECTION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+# Index storage formats; the side table always keeps the exact float32 vectors
+VECTOR_DTYPES = {
+    'float32': None,
+    'float16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit
+}
+# int8 learns per-dimension ranges; collections stay float32 until they have this many vectors
+SQ_MIN_TRAINING = 1000
+
+
+class _FileLock:
+    """Exclusive advisory lock shared by every process using a collection directory"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+class FaissCollection:
+    """
+    One FAISS index plus its SQLite side table.
+
+    The side table is the source of truth: it maps each FAISS id (the row
+    id) to the chunk text, metadata and float32 vector. The index only ever
+    holds a prefix of the table by id, so any process can bring it up to
+    date by adding the rows past the last id it has seen. Deleted rows are
+    dropped from the table immediately and from the index where the index
+    type supports removal; otherwise they stay in the index as tombstones,
+    are filtered out of results, and are reclaimed by a rebuild once they
+    make up too much of it.
+
+    With a float16 or int8 vector_dtype the index stores scalar-quantized
+    codes; searches fetch rescore_factor times as many candidates and rank
+    them by their exact float32 vectors from the side table.
+    """
+
+    def __init__(self, path, index_type='hnsw', hnsw_m=32, hnsw_ef_search=64,
+                 ivf_nlist=256, ivf_nprobe=16, compact_ratio=0.2, vector_dtype='float32',
+                 rescore_factor=4):
+        self.path = path
+        self.index_type = index_type
+        self.vector_dtype = vector_dtype
+        self.rescore_factor = rescore_factor
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.compact_ratio = compact_ratio
+
+        self.lock = threading.RLock()
+        self.index = None
+        self.max_id = 0            # Highest side-table id present in self.index
+        self.writable = False      # False while the index is a read-only mmap
+        self.dirty = False
+        self.last_write = 0.0
+        self._loaded_mtime = None
+
+        os.makedirs(path, exist_ok=True)
+        self._file_lock = _FileLock(os.path.join(path, LOCK_FILE))
+        self._connection = sqlite3.connect(
+            os.path.join(path, TABLE_FILE), timeout=30, check_same_thread=False
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' chunk_id TEXT NOT NULL UNIQUE,'
+            ' document_id INTEGER,'
+            ' content TEXT NOT NULL,'
+            ' metadata TEXT NOT NULL,'
+            ' vector BLOB NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS ix_chunks_document_id ON chunks (document_id)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._connection.commit()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, INDEX_FILE)
+
+    # Side table
+
+    def _meta(self, key):
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_meta(self, key, value):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, json.dumps(value))
+        )
+
+    @property
+    def dimension(self):
+        return self._meta('dimension')
+
+    def live_count(self, up_to=None):
+        if up_to is None:
+            return self._connection.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+        return self._connection.execute('SELECT COUNT(*) FROM chunks WHERE id <= ?', (up_to,)).fetchone()[0]
+
+    def _vectors(self, query, params=()):
+        """(ids, float32 matrix) of the rows selected by query"""
+        rows = self._connection.execute(query, params).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        dimension = self.dimension
+        vectors = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.float32).reshape(-1, dimension)
+        return ids, vectors
+
+    # Index lifecycle
+
+    def _empty_index(self, dimension, training=None):
+        """New index of the configured type, trained on training vectors for IVF and int8"""
+        count = len(training) if training is not None else 0
+        qtype = VECTOR_DTYPES[self.vector_dtype]
+        if self.index_type == 'ivf' and count >= self.ivf_nlist * 39:
+            quantizer = faiss.IndexFlatIP(dimension)
+            if qtype is None:
+                index = faiss.IndexIVFFlat(quantizer, dimension, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, dimension, self.ivf_nlist, qtype, faiss.METRIC_INNER_PRODUCT
+                )
+            # A few hundred points per centroid is plenty for k-means
+            index.train(training[::max(1, count // (self.ivf_nlist * 256))])
+            index.nprobe = self.ivf_nprobe
+            return index
+        if qtype is not None and (self.vector_dtype == 'float16' or count >= SQ_MIN_TRAINING):
+            if self.index_type == 'hnsw':
+                base = faiss.IndexHNSWSQ(dimension, qtype, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                base.hnsw.efSearch = self.hnsw_ef_search
+            else:
+                base = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            if not base.is_trained:
+                base.train(training[::max(1, count // (SQ_MIN_TRAINING * 50))])
+        elif self.index_type == 'hnsw':
+            base = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efSearch = self.hnsw_ef_search
+        else:
+            # Exact search; also the IVF layout until there is enough data to train it
+            base = faiss.IndexFlatIP(dimension)
+        return faiss.IndexIDMap2(base)
+
+    def _is_trained_ivf(self):
+        return isinstance(self.index, faiss.IndexIVF)
+
+    def _is_quantized(self):
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap2):
+            index = faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        return isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer))
+
+    def _needs_training(self):
+        """Whether enough vectors arrived to train the configured layout"""
+        if self.index_type == 'ivf' and not self._is_trained_ivf():
+            return self.index.ntotal >= self.ivf_nlist * 39
+        if self.vector_dtype == 'int8' and not self._is_quantized():
+            return self.index.ntotal >= SQ_MIN_TRAINING
+        return False
+
+    def _supports_remove(self):
+        return self.index_type != 'hnsw'
+
+    def load(self):
+        """Open the persisted index read-only and memory-mapped, then catch up"""
+        with self.lock:
+            dimension = self.dimension
+            if dimension is None:
+                self.index = None
+                self.max_id = 0
+                return
+            with self._file_lock:
+                flushed_id = self._meta('flushed_id') or 0
+                # An index written with another vector_dtype is rebuilt from the side table
+                if os.path.exists(self.index_path) \
+                        and (self._meta('vector_dtype') or 'float32') == self.vector_dtype:
+                    self.index = self._read_mapped()
+                    self._loaded_mtime = os.path.getmtime(self.index_path)
+                    self.max_id = flushed_id
+                    self.writable = False
+                else:
+                    self.index = None
+                    self.max_id = 0
+            if self.index is None:
+                self.rebuild()
+            else:
+                self.catch_up()
+
+    def refresh(self):
+        """Reload if another process flushed a newer index, then pick up unflushed rows"""
+        with self.lock:
+            if not self.dirty and os.path.exists(self.index_path) \
+                    and os.path.getmtime(self.index_path) != self._loaded_mtime:
+                self.load()
+            else:
+                self.catch_up()
+
+    def _read_mapped(self):
+        """Open the index file read-only with its vectors memory-mapped"""
+        if self._meta('ivf'):
+            # Inverted lists are mapped by the IVF reader itself
+            flags = faiss.IO_FLAG_MMAP
+        else:
+            # Flat and HNSW storage (faiss >= 1.10)
+            flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+        return faiss.read_index(self.index_path, flags | faiss.IO_FLAG_READ_ONLY)
+
+    def _make_writable(self):
+        """
+        Replace a read-only mmap with an in-memory copy before mutating it
+
+        The copy is read from the current file, which may be newer than the
+        mapped one, so max_id is reset to what that file covers.
+        """
+        if self.index is None or self.writable:
+            return
+        with self._file_lock:
+            self.index = faiss.read_index(self.index_path)
+            self.max_id = self._meta('flushed_id') or 0
+            self._loaded_mtime = os.path.getmtime(self.index_path)
+        self.writable = True
+
+    def catch_up(self):
+        """Add side-table rows past max_id (written by this or another process)"""
+        with self.lock:
+            if self.index is None:
+                if self.dimension is not None:
+                    self.rebuild()
+                return
+            has_new = self._connection.execute(
+                'SELECT 1 FROM chunks WHERE id > ? LIMIT 1', (self.max_id,)
+            ).fetchone()
+            if not has_new:
+                return
+            self._make_writable()
+            ids, vectors = self._vectors(
+                'SELECT id, vector FROM chunks WHERE id > ? ORDER BY id', (self.max_id,)
+            )
+            if not len(ids):
+                return
+            self.index.add_with_ids(vectors, ids)
+            self.max_id = int(ids[-1])
+            self.dirty = True
+            if self._needs_training():
+                self.rebuild()
+
+    def rebuild(self):
+        """Build a fresh index from the side table, dropping every tombstone"""
+        with self.lock:
+            dimension = self.dimension
+            if dimension is None:
+                return
+            ids, vectors = self._vectors('SELECT id, vector FROM chunks ORDER BY id')
+            index = self._empty_index(dimension, training=vectors)
+            if len(ids):
+                index.add_with_ids(vectors, ids)
+            self.index = index
+            self.max_id = int(ids[-1]) if len(ids) else self._max_table_id()
+            self.writable = True
+            self.dirty = True
+
+    def _max_table_id(self):
+        return self._connection.execute('SELECT COALESCE(MAX(id), 0) FROM chunks').fetchone()[0]
+
+    def flush(self):
+        """Write the index to disk atomically and reopen it memory-mapped"""
+        with self.lock:
+            if not self.dirty or self.index is None:
+                return
+            if not os.path.isdir(self.path):
+                # Dropped by another process
+                self.dirty = False
+                return
+            self.catch_up()
+            with self._file_lock:
+                tmp_path = f"{self.index_path}.tmp"
+                faiss.write_index(self.index, tmp_path)
+                os.replace(tmp_path, self.index_path)
+                self._set_meta('flushed_id', self.max_id)
+                self._set_meta('ivf', self._is_trained_ivf())
+                self._set_meta('vector_dtype', self.vector_dtype)
+                self._connection.commit()
+                self._loaded_mtime = os.path.getmtime(self.index_path)
+            self.dirty = False
+            # Serve reads from the page cache instead of a private copy
+            self.index = self._read_mapped()
+            self.writable = False
+
+    # Chunk operations
+
+    def add(self, ids, embeddings, documents, metadatas, collection_metadata=None):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        with self.lock:
+            dimension = self.dimension
+            if dimension is None:
+                self._set_meta('dimension', vectors.shape[1])
+                for key, value in (collection_metadata or {}).items():
+                    self._set_meta(f'collection:{key}', value)
+            elif vectors.shape[1] != dimension:
+                raise ValueError(f'Embedding dimension {vectors.shape[1]} does not match collection dimension {dimension}')
+
+            # Re-added chunk IDs get new rows; drop their old vectors from the index
+            replaced = self._row_ids(ids)
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO chunks (chunk_id, document_id, content, metadata, vector) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (chunk_id, (metadata or {}).get('document_id'), content, json.dumps(metadata or {}), vector.tobytes())
+                    for chunk_id, content, metadata, vector in zip(ids, documents, metadatas, vectors)
+                ]
+            )
+            self._connection.commit()
+            if replaced:
+                self._remove_ids(replaced)
+            self.catch_up()
+            self.last_write = time.monotonic()
+
+    def get_chunks(self, document_id=None):
+        with self.lock:
+            if document_id is None:
+                rows = self._connection.execute('SELECT chunk_id, content FROM chunks ORDER BY id')
+            else:
+                rows = self._connection.execute(
+                    'SELECT chunk_id, content FROM chunks WHERE document_id = ? ORDER BY id', (document_id,)
+                )
+            return rows.fetchall()
+
+    def update_metadata(self, ids, metadatas):
+        with self.lock:
+            self._connection.executemany(
+                'UPDATE chunks SET metadata = ?, document_id = ? WHERE chunk_id = ?',
+                [
+                    (json.dumps(metadata or {}), (metadata or {}).get('document_id'), chunk_id)
+                    for chunk_id, metadata in zip(ids, metadatas)
+                ]
+            )
+            self._connection.commit()
+
+    def _row_ids(self, chunk_ids):
+        """Side-table (and index) IDs of the existing chunks among chunk_ids"""
+        ids = []
+        for start in range(0, len(chunk_ids), 500):
+            batch = list(chunk_ids[start:start + 500])
+            placeholders = ','.join('?' * len(batch))
+            ids.extend(
+                row[0] for row in self._connection.execute(
+                    f'SELECT id FROM chunks WHERE chunk_id IN ({placeholders})', batch
+                )
+            )
+        return ids
+
+    def delete(self, chunk_ids):
+        with self.lock:
+            ids = self._row_ids(chunk_ids)
+            for start in range(0, len(chunk_ids), 500):
+                batch = list(chunk_ids[start:start + 500])
+                placeholders = ','.join('?' * len(batch))
+                self._connection.execute(f'DELETE FROM chunks WHERE chunk_id IN ({placeholders})', batch)
+            self._connection.commit()
+            if ids:
+                self._remove_ids(ids)
+
+    def delete_document(self, document_id):
+        with self.lock:
+            ids = [
+                row[0] for row in self._connection.execute(
+                    'SELECT id FROM chunks WHERE document_id = ?', (document_id,)
+                )
+            ]
+            if not ids:
+                return
+            self._connection.execute('DELETE FROM chunks WHERE document_id = ?', (document_id,))
+            self._connection.commit()
+            self._remove_ids(ids)
+
+    def _remove_ids(self, ids):
+        if self.index is None:
+            return
+        self.last_write = time.monotonic()
+        if self._supports_remove():
+            self._make_writable()
+            self.index.remove_ids(np.array(ids, dtype=np.int64))
+            self.dirty = True
+        elif self.index.ntotal and self.tombstones() > self.compact_ratio * self.index.ntotal:
+            self.rebuild()
+
+    def tombstones(self):
+        """Vectors still in the index whose rows have been deleted"""
+        return max(0, self.index.ntotal - self.live_count(self.max_id)) if self.index is not None else 0
+
+    def query(self, embedding, k, document_ids=None, include_embeddings=False):
+        vector = np.ascontiguousarray([embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        with self.lock:
+            self.refresh()
+            if self.index is None or not self.index.ntotal:
+                return []
+
+            selector = None
+            if document_ids is not None:
+                document_ids = list(document_ids)
+                placeholders = ','.join('?' * len(document_ids))
+                allowed = np.array([
+                    row[0] for row in self._connection.execute(
+                        f'SELECT id FROM chunks WHERE document_id IN ({placeholders}) AND id <= ?',
+                        (*document_ids, self.max_id)
+                    )
+                ], dtype=np.int64)
+                if not len(allowed):
+                    return []
+                # Filtering is only needed when other documents share the index
+                if len(allowed) < self.live_count(self.max_id):
+                    selector = faiss.IDSelectorBatch(len(allowed), faiss.swig_ptr(allowed))
+
+            # Quantized scores only pick candidates; the exact vectors rank them
+            rescore = self.vector_dtype != 'float32'
+            wanted = k * self.rescore_factor if rescore else k
+            
+            # Over-fetch to make up for tombstones, widening until enough live hits are found
+            fetch_k = min(self.index.ntotal, wanted + self.tombstones())
+            while True:
+                scores, labels = self.index.search(vector, fetch_k, params=self._search_params(selector))
+                hits = self._hits(scores[0], labels[0], include_embeddings, vector[0] if rescore else None)
+                if len(hits) >= wanted or fetch_k >= self.index.ntotal:
+                    return hits[:k]
+                fetch_k = min(self.index.ntotal, fetch_k * 2)
+
+    def _search_params(self, selector):
+        if self._is_trained_ivf():
+            params = faiss.SearchParametersIVF()
+            params.nprobe = self.ivf_nprobe
+        elif self.index_type == 'hnsw':
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = self.hnsw_ef_search
+        else:
+            params = faiss.SearchParameters()
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    def _hits(self, scores, labels, include_embeddings, rescore_vector=None):
+        """Join search results with the side table, skipping tombstones (and rescoring exactly if asked)"""
+        found = [(int(label), float(score)) for label, score in zip(labels, scores) if label >= 0]
+        if not found:
+            return []
+        placeholders = ','.join('?' * len(found))
+        rows = {
+            row[0]: row for row in self._connection.execute(
+                f'SELECT id, content, metadata, vector FROM chunks WHERE id IN ({placeholders})',
+                [label for label, _ in found]
+            )
+        }
+        found = [(label, score) for label, score in found if label in rows]
+        if rescore_vector is not None:
+            found = sorted(
+                ((label, float(np.frombuffer(rows[label][3], dtype=np.float32) @ rescore_vector)) for label, _ in found),
+                key=lambda hit: hit[1],
+                reverse=True
+            )
+        return [
+            VectorHit(
+                content=rows[label][1],
+                metadata=json.loads(rows[label][2]),
+                score=score,
+                embedding=np.frombuffer(rows[label][3], dtype=np.float32).tolist() if include_embeddings else None
+            )
+            for label, score in found
+        ]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'index_type': type(faiss.downcast_index(self.index)).__name__ if self.index is not None else None,
+                'vectors': int(self.index.ntotal) if self.index is not None else 0,
+                'tombstones': self.tombstones(),
+                'vector_dtype': self.vector_dtype if self._is_quantized() else 'float32',
+                'memory_mapped': self.index is not None and not self.writable,
+                'dirty': self.dirty
+            }
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.index = None
+            self._connection.close()
+
+
+class FaissVectorStore(VectorStore):
+    """
+    Local vector store with one FAISS index per collection on disk.
+
+    Each collection directory holds the index file and a SQLite side table
+    (see FaissCollection). Indexes are opened memory-mapped and read-only, so
+    every worker process shares the page cache instead of holding its own
+    copy; a process copies an index into memory only while it is writing to
+    it. Writes go to the side table first and are flushed to the index file
+    by a background thread once a collection has been idle for
+    flush_seconds, and on shutdown. Other processes notice a newer file and
+    reopen it, and read unflushed rows straight from the side table. At most
+    max_open collections are kept open; the least recently used one is
+    flushed and closed.
+
+    Index types: 'hnsw' (default, approximate, deletions are tombstoned and
+    periodically compacted), 'ivf' (exact until the collection is large
+    enough to train nlist centroids) and 'flat' (exact). vector_dtype
+    'float16' or 'int8' stores the index scalar-quantized (2x / 4x smaller)
+    with exact float32 rescoring of the candidates.
+    """
+
+    def __init__(self, root, index_type='hnsw', hnsw_m=32, hnsw_ef_search=64, ivf_nlist=256,
+                 ivf_nprobe=16, compact_ratio=0.2, flush_seconds=5.0, max_open=64,
+                 vector_dtype='float32', rescore_factor=4):
+        if index_type not in ('hnsw', 'ivf', 'flat'):
+            raise ValueError(f'Unsupported FAISS index type: {index_type}')
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f'Unsupported vector dtype: {vector_dtype}')
+        self.root = root
+        self.max_open = max_open
+        self.flush_seconds = flush_seconds
+        self._options = {
+            'index_type': index_type,
+            'hnsw_m': hnsw_m,
+            'hnsw_ef_search': hnsw_ef_search,
+            'ivf_nlist': ivf_nlist,
+            'ivf_nprobe': ivf_nprobe,
+            'compact_ratio': compact_ratio,
+            'vector_dtype': vector_dtype,
+            'rescore_factor': rescore_factor
+        }
+        self._collections = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+        self._flusher = threading.Thread(target=self._flush_loop, name='faiss-flush', daemon=True)
+        self._flusher.start()
+
+    def _path(self, collection_name):
+        if not _COLLECTION_NAME.match(collection_name or ''):
+            raise ValueError(f'Invalid collection name: {collection_name}')
+        return os.path.join(self.root, collection_name)
+
+    def _collection(self, collection_name, create=False):
+        """Open (or with create, create) a collection, keeping an LRU of open ones"""
+        path = self._path(collection_name)
+        evicted = None
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self._collections.move_to_end(collection_name)
+                return collection
+            if not create and not os.path.exists(os.path.join(path, TABLE_FILE)):
+                raise ValueError(f'Collection {collection_name} does not exist')
+            collection = FaissCollection(path, **self._options)
+            collection.load()
+            self._collections[collection_name] = collection
+            if len(self._collections) > self.max_open:
+                _, evicted = self._collections.popitem(last=False)
+        if evicted is not None:
+            evicted.close()
+        return collection
+
+    def add(self, collection_name, ids, embeddings, documents, metadatas, collection_metadata=None):
+        if not ids:
+            return
+        self._collection(collection_name, create=True).add(
+            ids, embeddings, documents, metadatas, collection_metadata
+        )
+
+    def query(self, collection_name, embedding, k, document_ids=None, include_embeddings=False):
+        return self._collection(collection_name).query(embedding, k, document_ids, include_embeddings)
+
+    def has_collection(self, collection_name):
+        path = self._path(collection_name)
+        with self._lock:
+            if collection_name in self._collections:
+                return True
+        return os.path.exists(os.path.join(path, TABLE_FILE))
+
+    def get_chunks(self, collection_name, document_id=None):
+        return self._collection(collection_name).get_chunks(document_id)
+
+    def update_metadata(self, collection_name, ids, metadatas):
+        self._collection(collection_name).update_metadata(ids, metadatas)
+
+    def delete(self, collection_name, ids):
+        self._collection(collection_name).delete(ids)
+
+    def delete_document(self, collection_name, document_id):
+        self._collection(collection_name).delete_document(document_id)
+
+    def drop_collection(self, collection_name):
+        path = self._path(collection_name)
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+        if collection is not None:
+            with collection.lock:
+                collection.dirty = False
+                collection.close()
+        if not os.path.exists(path):
+            raise ValueError(f'Collection {collection_name} does not exist')
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _flush_loop(self):
+        """Flush collections that have been idle for flush_seconds"""
+        while not self._stopped.wait(max(self.flush_seconds / 2, 0.5)):
+            with self._lock:
+                collections = list(self._collections.values())
+            now = time.monotonic()
+            for collection in collections:
+                if collection.dirty and now - collection.last_write >= self.flush_seconds:
+                    try:
+                        collection.flush()
+                    except Exception as e:
+                        print(f"Error flushing FAISS index {collection.path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            collections = dict(self._collections)
+        per_collection = {name: collection.stats() for name, collection in collections.items()}
+        return {
+            'backend': 'faiss',
+            'index_type': self._options['index_type'],
+            'open_collections': len(per_collection),
+            'vectors': sum(stats['vectors'] for stats in per_collection.values()),
+            'tombstones': sum(stats['tombstones'] for stats in per_collection.values()),
+            'unflushed_collections': sum(1 for stats in per_collection.values() if stats['dirty'])
+        }
+
+    def close(self):
+        self._stopped.set()
+        with self._lock:
+            collections = list(self._collections.values())
+            self._collections.clear()
+        for collection in collections:
+            try:
+                collection.close()
+            except Exception as e:
+                print(f"Error closing FAISS index {collection.path}: {e}")
@@ -0,0 +1,267 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db
+from models import Document
+
+from config import Config
+
+# Chunk batches buffered between the extract and embed stages
+QUEUE_DEPTH = 4
+QUEUE_POLL_SECONDS = 1.0
+
+
+class IngestionPipeline:
+    """
+    Background document ingestion.
+    Uploads are processed off the request thread in two pipelined stages:
+    parsing + chunking runs in the extraction process pool and is followed
+    by a thread that streams chunk batches through a small bounded queue to
+    embedding + indexing (network bound), so memory stays flat regardless of
+    document size. Progress is written to the Document row so clients can
+    poll the job.
+    """
+
+    def __init__(self, extraction_pool, chunk_store=None, extract_workers=2, embed_workers=2):
+        self.extraction_pool = extraction_pool
+        self.chunk_store = chunk_store
+        self.extract_executor = ThreadPoolExecutor(
+            max_workers=extract_workers,
+            thread_name_prefix='ingest-extract'
+        )
+        self.embed_executor = ThreadPoolExecutor(
+            max_workers=embed_workers,
+            thread_name_prefix='ingest-embed'
+        )
+        # Feeds bulk uploads into the extraction pool as it frees up
+        self.batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-batch')
+        self._stopped = threading.Event()
+
+    def submit(self, app, document, ext):
+        """
+        Queue a saved upload for ingestion
+
+        Args:
+            app: Flask application, used to open an app context in workers
+            document: Pending Document row of the upload
+            ext: File extension
+
+        Raises:
+            ValueError: If the extraction queue is full
+        """
+        extraction = self.extraction_pool.submit(document.filepath, ext, store_path=self._store_path(document.id))
+        self.extract_executor.submit(self._extract_stage, app, document.id, extraction)
+
+    def submit_batch(self, app, documents):
+        """
+        Queue the files of a bulk upload for ingestion
+
+        Unlike submit(), files wait for room in the extraction queue instead
+        of being rejected, so a large archive is ingested as capacity allows.
+
+        Args:
+            app: Flask application, used to open an app context in workers
+            documents: List of (document_id, filepath, ext) of pending uploads
+        """
+        self.batch_executor.submit(self._feed_batch, app, documents)
+
+    def _feed_batch(self, app, documents):
+        for document_id, filepath, ext in documents:
+            if self._stopped.is_set():
+                return
+            try:
+                extraction = self.extraction_pool.submit(
+                    filepath, ext, wait=True, store_path=self._store_path(document_id)
+                )
+            except Exception as e:
+                with app.app_context():
+                    self._fail(document_id, e)
+                continue
+            self.extract_executor.submit(self._extract_stage, app, document_id, extraction)
+
+    def submit_replacement(self, app, document, ext, replacement):
+        """
+        Queue a new version of a ready document for ingestion
+        
+        Args:
+            app: Flask application, used to open an app context in workers
+            document: Document being replaced, in 'updating' state
+            ext: File extension of the new version
+            replacement: Dict of filepath, filename, content_hash and file_size of the new upload
+        
+        Raises:
+            ValueError: If the extraction queue is full
+        """
+        store_path = self.chunk_store.staging_path_for(document.id) if self.chunk_store else None
+        extraction = self.extraction_pool.submit(replacement['filepath'], ext, store_path=store_path)
+        self.embed_executor.submit(self._replace, app, document.id, extraction, replacement)
+    
+    def _store_path(self, document_id):
+        return self.chunk_store.path_for(document_id) if self.chunk_store else None
+
+    @staticmethod
+    def _update(document, status, progress):
+        document.status = status
+        document.progress = progress
+        db.session.commit()
+
+    @staticmethod
+    def _fail(document_id, error):
+        db.session.rollback()
+        document = Document.query.get(document_id)
+        if document:
+            document.status = 'failed'
+            document.error_message = str(error)
+            db.session.commit()
+        print(f"Ingestion of document {document_id} failed: {error}")
+
+    def _put(self, chunk_queue, cancel, item):
+        """Block on the bounded queue until there is room or the job is cancelled"""
+        while not (cancel.is_set() or self._stopped.is_set()):
+            try:
+                chunk_queue.put(item, timeout=QUEUE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, chunk_queue):
+        """Wait for the next chunk batch, giving up if the pipeline is shut down"""
+        while not self._stopped.is_set():
+            try:
+                return chunk_queue.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return ('error', ValueError('Ingestion pipeline was shut down'), None)
+
+    def _extract_stage(self, app, document_id, extraction):
+        """Stage 1: follow the parser process and hand off chunk batches"""
+        chunk_queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        cancel = threading.Event()
+        self.embed_executor.submit(self._embed_stage, app, document_id, chunk_queue, cancel)
+
+        batch_size = Config.EMBEDDING_BATCH_SIZE * Config.EMBEDDING_MAX_IN_FLIGHT
+        try:
+            batch = []
+            for text, metadata, fraction in extraction.chunks():
+                batch.append((text, metadata))
+                if len(batch) >= batch_size:
+                    if not self._put(chunk_queue, cancel, ('chunks', batch, fraction)):
+                        return
+                    batch = []
+            if batch and not self._put(chunk_queue, cancel, ('chunks', batch, 1.0)):
+                return
+            self._put(chunk_queue, cancel, ('done', None, 1.0))
+        except Exception as e:
+            self._put(chunk_queue, cancel, ('error', ValueError(f'Error extracting text: {e}'), None))
+
+    def _embed_stage(self, app, document_id, chunk_queue, cancel):
+        """Stage 2: embed chunk batches as they arrive and write them to the vector store"""
+        from services.agentic_services.rag_service import RAGService
+
+        with app.app_context():
+            document = Document.query.get(document_id)
+            if not document:
+                cancel.set()
+                return
+
+            collection_name = document.vector_store_id
+            indexed = 0
+            try:
+                rag_service = RAGService.get_instance()
+                self._update(document, 'extracting', 5)
+
+                while True:
+                    kind, payload, fraction = self._get(chunk_queue)
+                    if kind == 'error':
+                        raise payload
+                    if kind == 'done':
+                        break
+
+                    try:
+                        document.embedding_dimension = rag_service._index_chunks(
+                            payload, collection_name, document, start=indexed
+                        )
+                    except Exception as e:
+                        raise ValueError(f'Error creating vector store: {e}')
+                    indexed += len(payload)
+                    # Page/paragraph counts are known up front for PDF/DOCX only
+                    progress = 5 + int(90 * fraction) if fraction is not None else 50
+                    self._update(document, 'embedding', max(document.progress, progress))
+
+                if not indexed:
+                    raise ValueError('No text content found in document')
+
+                # The document may have been deleted while it was being embedded
+                db.session.expire_all()
+                document = Document.query.get(document_id)
+                if document is None:
+                    rag_service._delete_vectors(collection_name, document_id)
+                    rag_service._delete_lexical(document_id)
+                    return
+
+                self._update(document, 'ready', 100)
+            except Exception as e:
+                cancel.set()
+                if indexed:
+                    try:
+                        RAGService.get_instance()._delete_lexical(document_id)
+                        RAGService.get_instance()._delete_vectors(collection_name, document_id)
+                    except Exception as cleanup_error:
+                        print(f"Could not remove partial vectors of document {document_id}: {cleanup_error}")
+                if self.chunk_store:
+                    self.chunk_store.delete(document_id)
+                self._fail(document_id, e)
+
+    def _replace(self, app, document_id, extraction, replacement):
+        """Collect the new version's chunks and diff them into the index"""
+        from services.agentic_services.rag_service import RAGService
+        
+        with app.app_context():
+            document = Document.query.get(document_id)
+            if not document:
+                return
+            
+            try:
+                # Only changed chunks are embedded, so the text is gathered up front
+                chunks = [(text, metadata) for text, metadata, _ in extraction.chunks()]
+                self._update(document, 'updating', 10)
+                
+                def progress(percent):
+                    document.progress = max(document.progress, int(percent))
+                    db.session.commit()
+                
+                counts = RAGService.get_instance().apply_replacement(
+                    document, chunks, progress=progress, **replacement
+                )
+                if self.chunk_store:
+                    self.chunk_store.promote(document_id)
+                print(
+                    f"Replaced document {document_id}: {counts['kept']} chunks kept, "
+                    f"{counts['embedded']} embedded, {counts['deleted']} deleted"
+                )
+            except Exception as e:
+                db.session.rollback()
+                # The current version stays indexed and searchable
+                document = Document.query.get(document_id)
+                if document and document.status == 'updating':
+                    document.status = 'ready'
+                    document.progress = 100
+                    document.error_message = f'Replacement failed: {e}'
+                    db.session.commit()
+                try:
+                    os.remove(replacement['filepath'])
+                except OSError:
+                    pass
+                if self.chunk_store:
+                    self.chunk_store.delete(document_id, staged=True)
+                print(f"Replacement of document {document_id} failed: {e}")
+    
+    def shutdown(self):
+        """Stop accepting work and drop queued jobs"""
+        self._stopped.set()
+        self.batch_executor.shutdown(wait=False, cancel_futures=True)
+        self.extract_executor.shutdown(wait=False, cancel_futures=True)
+        self.embed_executor.shutdown(wait=False, cancel_futures=True)
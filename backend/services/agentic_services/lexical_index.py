@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+
+# Query terms beyond this are ignored (FTS5 OR queries grow linearly)
+MAX_QUERY_TERMS = 32
+
+_TERM = re.compile(r'\S+')
+_EDGE_PUNCTUATION = re.compile(r'^[^\w]+|[^\w]+$')
+
+
+def build_match_query(query):
+    """
+    FTS5 MATCH expression for a free-text question
+
+    Every whitespace-separated term becomes a quoted phrase, so identifiers
+    such as 'ERR-1234', 'v2.3.1' or 'SKU_88' match their tokens in order
+    instead of being parsed as FTS5 syntax. Terms are OR-ed and ranked by
+    BM25.
+
+    Returns:
+        str: MATCH expression, or None if the query has no searchable terms
+    """
+    phrases = {}
+    for term in _TERM.findall(query):
+        term = _EDGE_PUNCTUATION.sub('', term)
+        if term:
+            phrases.setdefault(term.lower(), term)
+    if not phrases:
+        return None
+    terms = list(phrases.values())[:MAX_QUERY_TERMS]
+    return ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+class LexicalIndex:
+    """
+    BM25 keyword index of chunk text in SQLite FTS5.
+    Complements embedding search for exact tokens (error codes, SKUs,
+    names) that embeddings blur. Chunks are stored in a plain table keyed
+    by (document_id, chunk_index) with an external-content FTS5 index kept
+    in sync by triggers, so documents are added and deleted incrementally.
+    The file is shared by every worker process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.searches = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            ' id INTEGER PRIMARY KEY,'
+            ' document_id INTEGER NOT NULL,'
+            ' chunk_index INTEGER NOT NULL,'
+            ' content TEXT NOT NULL,'
+            ' metadata TEXT NOT NULL,'
+            ' UNIQUE (document_id, chunk_index));'
+            'CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5('
+            ' content, content=\'chunks\', content_rowid=\'id\', tokenize=\'unicode61 remove_diacritics 2\');'
+            'CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN'
+            ' INSERT INTO chunks_fts (rowid, content) VALUES (new.id, new.content); END;'
+            'CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN'
+            ' INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES (\'delete\', old.id, old.content); END;'
+        )
+        self._connection.commit()
+
+    def add(self, document_id, start, chunks):
+        """
+        Index a batch of a document's chunks, replacing any at the same positions
+
+        Args:
+            document_id: Document whose vectors the chunks belong to
+            start: Index of the first chunk in the document
+            chunks: List of (text, metadata)
+        """
+        if not chunks:
+            return
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM chunks WHERE document_id = ? AND chunk_index BETWEEN ? AND ?',
+                (document_id, start, start + len(chunks) - 1)
+            )
+            self._connection.executemany(
+                'INSERT INTO chunks (document_id, chunk_index, content, metadata) VALUES (?, ?, ?, ?)',
+                [
+                    (document_id, start + i, text, json.dumps(metadata))
+                    for i, (text, metadata) in enumerate(chunks)
+                ]
+            )
+            self._connection.commit()
+
+    def delete_document(self, document_id, from_chunk=0):
+        """Remove a document's chunks (from chunk index from_chunk onwards)"""
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM chunks WHERE document_id = ? AND chunk_index >= ?', (document_id, from_chunk)
+            )
+            self._connection.commit()
+
+    def has_document(self, document_id):
+        """Whether any chunk of a document is indexed"""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT 1 FROM chunks WHERE document_id = ? LIMIT 1', (document_id,)
+            ).fetchone() is not None
+
+    def search(self, query, document_ids, k):
+        """
+        Best BM25 matches for a question among the given documents
+
+        Args:
+            query: User question
+            document_ids: Documents to search
+            k: Number of chunks to return
+
+        Returns:
+            list: (content, metadata, BM25 relevance) tuples, best first
+        """
+        match = build_match_query(query)
+        document_ids = list(document_ids)
+        if match is None or not document_ids:
+            return []
+
+        placeholders = ','.join('?' * len(document_ids))
+        with self._lock:
+            self.searches += 1
+            rows = self._connection.execute(
+                'SELECT c.content, c.metadata, bm25(chunks_fts) AS rank'
+                ' FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid'
+                f' WHERE chunks_fts MATCH ? AND c.document_id IN ({placeholders})'
+                ' ORDER BY rank LIMIT ?',
+                (match, *document_ids, k)
+            ).fetchall()
+        # FTS5 bm25() is lower-is-better
+        return [(content, json.loads(metadata), -rank) for content, metadata, rank in rows]
+
+    def stats(self):
+        with self._lock:
+            chunks = self._connection.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+            return {'chunks': chunks, 'searches': self.searches}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
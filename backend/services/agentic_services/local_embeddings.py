@@ -0,0 +1,125 @@
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Model specs with this prefix are embedded locally, e.g. 'local:all-MiniLM-L6-v2'
+LOCAL_PREFIX = 'local:'
+
+# Per-process model used by pool workers (see _load_worker_model)
+_worker_model = None
+
+
+def is_local_model(name):
+    """True if an embedding model name refers to a local sentence-transformers model"""
+    return name.startswith(LOCAL_PREFIX)
+
+
+def _load_model(name, device, cache_dir):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ValueError('Local embeddings require the sentence-transformers package')
+    return SentenceTransformer(name, device=device, cache_folder=cache_dir)
+
+
+def _encode(model, texts, batch_size, dimensions):
+    """Encode texts into unit-length vectors, optionally truncated to dimensions"""
+    vectors = model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=dimensions is None,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    result = []
+    for vector in vectors.tolist():
+        if dimensions is not None:
+            # Matryoshka-style shortening: keep the leading dimensions and re-normalize
+            vector = vector[:dimensions]
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vector = [x / norm for x in vector]
+        result.append(vector)
+    return result
+
+
+def _load_worker_model(name, device, cache_dir, torch_threads):
+    """Pool initializer: load the model once per worker process"""
+    global _worker_model
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_model = _load_model(name, device, cache_dir)
+
+
+def _encode_in_worker(texts, batch_size, dimensions):
+    return _encode(_worker_model, texts, batch_size, dimensions)
+
+
+class LocalEmbeddings:
+    """
+    sentence-transformers embeddings computed on this machine.
+    Implements the embed_documents/embed_query interface of the LangChain
+    embedding clients, so BatchEmbedder, the embedding cache and every
+    collection keyed by model work unchanged, without any network access
+    once the model files are cached.
+
+    With workers=0 the model runs in this process; calls take turns on a
+    lock one batch at a time, so a query waits for at most one ingestion
+    batch. With workers>0 each of that many spawned processes loads its own
+    copy of the model and batches run in parallel, away from the GIL of the
+    request workers.
+    """
+
+    def __init__(self, model, dimensions=None, device='cpu', batch_size=32, workers=0,
+                 cache_dir=None, torch_threads=0):
+        self.model = model
+        self.dimensions = dimensions
+        self.device = device
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.torch_threads = torch_threads
+        self._lock = threading.Lock()
+        self._model = None
+        self._pool = None
+
+        if workers:
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_load_worker_model,
+                initargs=(model, device, cache_dir, torch_threads)
+            )
+        else:
+            if torch_threads:
+                import torch
+                torch.set_num_threads(torch_threads)
+            self._model = _load_model(model, device, cache_dir)
+
+    def _encode_batch(self, texts):
+        if self._pool is not None:
+            return self._pool.submit(_encode_in_worker, texts, self.batch_size, self.dimensions).result()
+        with self._lock:
+            return _encode(self._model, texts, self.batch_size, self.dimensions)
+
+    def embed_documents(self, texts):
+        """Embed texts in batches of batch_size"""
+        if self._pool is not None:
+            futures = [
+                self._pool.submit(_encode_in_worker, texts[i:i + self.batch_size], self.batch_size, self.dimensions)
+                for i in range(0, len(texts), self.batch_size)
+            ]
+            return [vector for future in futures for vector in future.result()]
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode_batch([text])[0]
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of recent query embeddings.
+    Keys are (embedding model, whitespace-normalised query) so repeated and
+    follow-up questions skip the embedding API entirely.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(model, query):
+        return model, ' '.join(query.split())
+
+    def get_or_embed(self, model, query, embed_fn):
+        """
+        Return the cached embedding for a query, computing it on a miss
+
+        Args:
+            model: Embedding model name
+            query: Query text
+            embed_fn: Callable taking the query and returning its vector
+
+        Returns:
+            list: Query embedding
+        """
+        key = self._key(model, query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            self.misses += 1
+
+        # Embed outside the lock so slow API calls do not serialise lookups
+        embedding = embed_fn(query)
+
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return embedding
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -1,61 +1,80 @@
 import os
+import re
 import uuid
+import hashlib
+import threading
+import time
+import zipfile
+from concurrent.futures import TimeoutError as FuturesTimeoutError, wait
 from datetime import datetime
+from flask import current_app
 from werkzeug.utils import secure_filename
-from pypdf import PdfReader
-from docx import Document as DocxDocument
-import chromadb
-from chromadb.config import Settings
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_core.documents import Document as LangchainDocument
+
+from sqlalchemy import or_
 
 from models import db
 from models import Document, ChatHistory
 
 from services.auth_services.auth_service import AuthService
+from services.agentic_services.client_registry import ClientRegistry
+from services.agentic_services.answer_cache import document_set_version
+from services.agentic_services.retrieval_ranking import (
+    RetrievedChunk, merge_top_k, mmr_rerank, reciprocal_rank_fusion
+)
 from config import Config
 
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Documents indexed before the model was recorded used this one
+LEGACY_EMBEDDING_MODEL = 'text-embedding-3-small'
+# Chroma's limit on collection name length
+MAX_COLLECTION_NAME = 63
+
 class RAGService:
     """LangChain Agentic RAG service for document management and chat"""
     
+    _instance = None
+    _instance_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize RAG service"""
-        if not Config.OPENAI_API_KEY:
-            raise ValueError('OpenAI API key not configured')
-        
-        # Initialize OpenAI embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=Config.OPENAI_API_KEY
-        )
-        
-        # Initialize OpenAI model
-        self.llm = ChatOpenAI(
-            model=Config.OPENAI_MODEL,
-            openai_api_key=Config.OPENAI_API_KEY,
-            temperature=0.7
-        )
-        
-        # Initialize Chroma client
-        self.chroma_client = chromadb.PersistentClient(
-            path=Config.CHROMA_DB_PATH
-        )
-        
-        # Initialize web search tool
-        self.search_tool = DuckDuckGoSearchRun()
+        self.registry = ClientRegistry()
+    
+    @classmethod
+    def get_instance(cls):
+        """Return the process-wide RAG service shared by all request threads"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
+    @property
+    def embeddings(self):
+        return self.registry.embeddings
+    
+    @property
+    def llm(self):
+        return self.registry.llm
+    
+    @property
+    def vector_store(self):
+        return self.registry.vector_store
+    
+    @property
+    def search_tool(self):
+        return self.registry.search_tool
     
     def upload_document(self, file, user_id):
         """
-        Upload and process document for RAG
+        Save an upload and queue it for background ingestion
         
         Args:
             file: File object from request
             user_id: User ID
             
         Returns:
-            dict: Document data
+            dict: Document data, including the ingestion job ID and status
             
         Raises:
             ValueError: If file is invalid
@@ -64,7 +83,109 @@ class RAGService:
         if not file:
             raise ValueError('No file provided')
         
-        filename = secure_filename(file.filename)
+        filename, ext = self._validate_filename(file.filename)
+        document = self._store_upload(file.stream, filename, ext, user_id)
+        
+        if document.status == 'pending':
+            try:
+                self.registry.ingestion_pipeline.submit(current_app._get_current_object(), document, ext)
+            except ValueError:
+                # Parser queue is full: do not keep an upload that will never be processed
+                os.remove(document.filepath)
+                db.session.delete(document)
+                db.session.commit()
+                raise
+        
+        return document.to_dict()
+    
+    def upload_batch(self, files, user_id):
+        """
+        Save several uploads (plain files and/or ZIP archives) as one batch
+        
+        ZIP members are streamed straight from the archive into document
+        storage; nothing is unpacked to a scratch directory. Files that fail
+        validation are reported in the result instead of failing the batch.
+        
+        Args:
+            files: File objects from request
+            user_id: User ID
+            
+        Returns:
+            dict: Batch status with one job per accepted file and the rejected files
+            
+        Raises:
+            ValueError: If no files were provided
+        """
+        files = [file for file in files or [] if file and file.filename]
+        if not files:
+            raise ValueError('No files provided')
+        
+        batch_id = str(uuid.uuid4())
+        pending = []
+        rejected = []
+        accepted = 0
+        
+        def add(raw_name, stream, max_bytes=None):
+            nonlocal accepted
+            if accepted >= Config.BULK_UPLOAD_MAX_FILES:
+                rejected.append({'filename': raw_name, 'error': f'Batch is limited to {Config.BULK_UPLOAD_MAX_FILES} files'})
+                return
+            try:
+                filename, ext = self._validate_filename(raw_name)
+                document = self._store_upload(stream, filename, ext, user_id, batch_id, max_bytes)
+            except ValueError as e:
+                rejected.append({'filename': raw_name, 'error': str(e)})
+                return
+            accepted += 1
+            if document.status == 'pending':
+                pending.append((document.id, document.filepath, ext))
+        
+        for file in files:
+            if not file.filename.lower().endswith('.zip'):
+                add(file.filename, file.stream)
+                continue
+            
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                rejected.append({'filename': file.filename, 'error': 'Invalid ZIP archive'})
+                continue
+            
+            with archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    # Skip folders and OS metadata (__MACOSX/, .DS_Store, ...)
+                    if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                        continue
+                    if info.file_size > Config.MAX_CONTENT_LENGTH:
+                        rejected.append({'filename': info.filename, 'error': 'File is too large'})
+                        continue
+                    try:
+                        with archive.open(info) as member:
+                            add(name, member, max_bytes=Config.MAX_CONTENT_LENGTH)
+                    except (RuntimeError, zipfile.BadZipFile) as e:
+                        # Encrypted or corrupt member
+                        rejected.append({'filename': info.filename, 'error': str(e)})
+        
+        if pending:
+            self.registry.ingestion_pipeline.submit_batch(current_app._get_current_object(), pending)
+        
+        if accepted:
+            batch = self.get_batch_status(batch_id, user_id)
+        else:
+            batch = {'batch_id': batch_id, 'status': 'failed', 'progress': 0, 'total': 0, 'files': []}
+        batch['rejected'] = rejected
+        return batch
+    
+    @staticmethod
+    def _validate_filename(raw_name):
+        """
+        Sanitize an upload's filename and check its extension
+        
+        Returns:
+            tuple: (safe filename, lower-case extension)
+        """
+        filename = secure_filename(raw_name or '')
         if not filename:
             raise ValueError('Invalid filename')
         
@@ -73,87 +194,752 @@ class RAGService:
         if ext not in Config.ALLOWED_EXTENSIONS:
             raise ValueError(f'File type not allowed. Allowed types: {Config.ALLOWED_EXTENSIONS}')
         
-        # Save file
+        return filename, ext
+    
+    def _store_upload(self, stream, filename, ext, user_id, batch_id=None, max_bytes=None):
+        """
+        Save an upload and create its Document row
+        
+        Identical bytes already indexed with the same model become a 'ready'
+        reference to the existing document; anything else is left 'pending'
+        for the caller to queue for ingestion.
+        
+        Returns:
+            Document: The new document
+        """
+        # Save file, hashing it as it streams in
         file_id = str(uuid.uuid4())
         filepath = os.path.join(Config.DOCUMENTS_PATH, f"{file_id}_{filename}")
-        file.save(filepath)
+        content_hash, file_size = self._save_upload(stream, filepath, max_bytes)
         
-        # Get file size
-        file_size = os.path.getsize(filepath)
+        # Identical bytes already indexed with the same model: reuse file and vectors
+        original = Document.query.filter_by(
+            content_hash=content_hash,
+            embedding_model=Config.EMBEDDING_MODEL,
+            source_document_id=None
+        ).filter(Document.status.in_(['ready', 'deleted'])).first()
         
-        # Extract text content
-        try:
-            text_content = self._extract_text(filepath, ext)
-        except Exception as e:
+        if original:
             os.remove(filepath)
-            raise ValueError(f'Error extracting text: {str(e)}')
+            document = Document(
+                filename=filename,
+                filepath=original.filepath,
+                user_id=user_id,
+                vector_store_id=original.vector_store_id,
+                file_size=file_size,
+                content_hash=content_hash,
+                embedding_model=original.embedding_model,
+                embedding_dimension=original.embedding_dimension,
+                source_document_id=original.id,
+                job_id=file_id,
+                batch_id=batch_id,
+                status='ready',
+                progress=100
+            )
+            db.session.add(document)
+            Document.query.filter_by(id=original.id).update({Document.ref_count: Document.ref_count + 1})
+            db.session.commit()
+            return document
         
-        # Create vector store for this document
-        try:
-            collection_name = f"doc_{file_id}"
-            vector_store = self._create_vector_store(text_content, collection_name)
-        except Exception as e:
-            os.remove(filepath)
-            raise ValueError(f'Error creating vector store: {str(e)}')
+        collection_name = self.collection_name_for(user_id, Config.EMBEDDING_MODEL, file_id)
         
-        # Save document to database
+        # Save document to database; extraction and embedding run in the background
         document = Document(
             filename=filename,
             filepath=filepath,
             user_id=user_id,
             vector_store_id=collection_name,
-            file_size=file_size
+            file_size=file_size,
+            content_hash=content_hash,
+            embedding_model=Config.EMBEDDING_MODEL,
+            job_id=file_id,
+            batch_id=batch_id,
+            status='pending',
+            progress=0
         )
+        
         db.session.add(document)
         db.session.commit()
+        return document
+    
+    @staticmethod
+    def _save_upload(stream, filepath, max_bytes=None):
+        """
+        Stream an upload to disk while hashing it
+        
+        Returns:
+            tuple: (sha256 hex digest, size in bytes)
+            
+        Raises:
+            ValueError: If the upload is larger than max_bytes
+        """
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(filepath, 'wb') as out:
+                while True:
+                    block = stream.read(UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError('File is too large')
+                    digest.update(block)
+                    out.write(block)
+        except Exception:
+            # Do not leave partial files behind
+            os.remove(filepath)
+            raise
+        return digest.hexdigest(), size
+    
+    def replace_document(self, document_id, file, user_id):
+        """
+        Replace a document with a new version, keeping its ID
+        
+        The new version is parsed in the background and diffed chunk by chunk
+        against the indexed one (see apply_replacement), so only changed
+        chunks are embedded. Chat keeps using the current chunks meanwhile.
+        
+        Args:
+            document_id: Document ID
+            file: File object from request
+            user_id: User ID
+            
+        Returns:
+            dict: Document data; status is 'updating' until the new version is indexed
+            
+        Raises:
+            ValueError: If the document cannot be replaced or the file is invalid
+        """
+        if not file:
+            raise ValueError('No file provided')
+        
+        document = Document.query.filter_by(id=document_id, user_id=user_id).filter(
+            Document.status != 'deleted'
+        ).first()
+        if not document:
+            raise ValueError('Document not found')
+        if document.source_document_id or document.ref_count > 1:
+            # Other uploads point at the same file and vectors
+            raise ValueError('Document is shared with identical uploads; upload the new version instead')
+        if document.status != 'ready':
+            raise ValueError('Document is still being processed')
+        
+        filename, ext = self._validate_filename(file.filename)
+        filepath = os.path.join(Config.DOCUMENTS_PATH, f"{uuid.uuid4()}_{filename}")
+        content_hash, file_size = self._save_upload(file.stream, filepath)
+        
+        if content_hash == document.content_hash:
+            os.remove(filepath)
+            return document.to_dict()
+        
+        document.status = 'updating'
+        document.progress = 0
+        document.error_message = None
+        db.session.commit()
+        
+        try:
+            self.registry.ingestion_pipeline.submit_replacement(
+                current_app._get_current_object(),
+                document,
+                ext,
+                {'filepath': filepath, 'filename': filename, 'content_hash': content_hash, 'file_size': file_size}
+            )
+        except ValueError:
+            # Parser queue is full: keep the current version
+            os.remove(filepath)
+            document.status = 'ready'
+            document.progress = 100
+            db.session.commit()
+            raise
         
         return document.to_dict()
     
-    def _extract_text(self, filepath, ext):
-        """Extract text from document"""
-        text = ""
+    def get_job_status(self, job_id, user_id):
+        """
+        Get the ingestion status of an upload
+        
+        Args:
+            job_id: Ingestion job ID returned by upload
+            user_id: User ID
+            
+        Returns:
+            dict: Job status and progress
+        """
+        document = Document.query.filter_by(job_id=job_id, user_id=user_id).first()
+        
+        if not document:
+            raise ValueError('Job not found')
+        
+        return self._job_status(document)
+    
+    def get_batch_status(self, batch_id, user_id):
+        """
+        Get the ingestion status of every file in a bulk upload
         
-        if ext == 'pdf':
-            reader = PdfReader(filepath)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+        Args:
+            batch_id: Batch ID returned by bulk upload
+            user_id: User ID
+            
+        Returns:
+            dict: Overall status and progress plus one job per file
+        """
+        documents = Document.query.filter_by(batch_id=batch_id, user_id=user_id).order_by(Document.id).all()
+        
+        if not documents:
+            raise ValueError('Batch not found')
+        
+        files = [self._job_status(document) for document in documents]
+        statuses = {job['status'] for job in files}
+        if statuses - {'ready', 'failed', 'deleted'}:
+            status = 'processing'
+        elif 'failed' in statuses:
+            status = 'completed_with_errors'
+        else:
+            status = 'completed'
+        
+        return {
+            'batch_id': batch_id,
+            'status': status,
+            'progress': sum(job['progress'] for job in files) // len(files),
+            'total': len(files),
+            'files': files
+        }
+    
+    @staticmethod
+    def _job_status(document):
+        return {
+            'job_id': document.job_id,
+            'document_id': document.id,
+            'filename': document.filename,
+            'status': document.status,
+            'progress': document.progress,
+            'error_message': document.error_message
+        }
+    
+    @classmethod
+    def collection_name_for_user(cls, user_id, model=None):
+        """
+        Name of the shared collection holding a user's chunks
+        
+        Users are folded onto RAG_COLLECTION_SHARDS tenant collections when
+        sharding is configured, otherwise each user gets their own collection.
+        Vectors of different embedding models never share a collection, so
+        the model is part of the name when given.
+        """
+        user_id = int(user_id)
+        if Config.RAG_COLLECTION_SHARDS > 0:
+            base = f"tenant_{user_id % Config.RAG_COLLECTION_SHARDS}"
+        else:
+            base = f"user_{user_id}"
+        return cls._with_model(base, model) if model else base
+    
+    @classmethod
+    def collection_name_for(cls, user_id, model, file_id=None):
+        """Collection a document's chunks embedded with model go to, for the current storage mode"""
+        if Config.RAG_STORAGE_MODE == 'per_user':
+            return cls.collection_name_for_user(user_id, model)
+        return cls._with_model(f"doc_{file_id or uuid.uuid4()}", model)
+    
+    @staticmethod
+    def _with_model(base, model):
+        slug = re.sub(r'[^a-zA-Z0-9_-]+', '-', model).strip('-_')
+        name = f"{base}.{slug}"
+        if len(name) > MAX_COLLECTION_NAME:
+            name = f"{base}.{hashlib.sha1(model.encode('utf-8')).hexdigest()[:12]}"
+        return name
+    
+    @staticmethod
+    def document_model(document):
+        """Embedding model a document's vectors were produced with"""
+        return document.embedding_model or LEGACY_EMBEDDING_MODEL
+    
+    @staticmethod
+    def is_shared_collection(collection_name):
+        """Whether a collection holds chunks of several documents (filtered by metadata)"""
+        return bool(collection_name) and not collection_name.startswith('doc_')
+    
+    def _index_chunks(self, chunks, collection_name, document, start=0, model=None, staging=None, lexical=True):
+        """
+        Embed a batch of chunks and write it to a collection
+        
+        Args:
+            chunks: List of (text, provenance metadata) from text_extraction.iter_chunks
+            collection_name: Target collection
+            document: Document the chunks belong to
+            start: Index of the first chunk in the document
+            model: Embedding model (defaults to the document's)
+            staging: Optional re-embed tag for a shared collection; the chunks
+                get IDs distinct from the document's current ones and no
+                'document_id', so queries skip them until they are published
+                (see reembed_document)
+            lexical: Also write the chunks to the keyword index
+            
+        Returns:
+            int: Embedding dimension
+        """
+        model = model or self.document_model(document)
+        texts = [text for text, _ in chunks]
+        embeddings = self.registry.batch_embedder_for(model).embed_documents(texts)
+        dimension = len(embeddings[0]) if embeddings else None
+        
+        if not self.is_shared_collection(collection_name):
+            ids = [str(uuid.uuid4()) for _ in chunks]
+        else:
+            ids = self._chunk_ids(document.id, start, len(chunks), staging)
+        metadatas = [
+            self._chunk_metadata(collection_name, document, start + i, metadata)
+            for i, (_, metadata) in enumerate(chunks)
+        ]
+        stored_metadatas = metadatas
+        if staging:
+            stored_metadatas = [self._staged_metadata(metadata) for metadata in metadatas]
+        
+        self.vector_store.add(
+            collection_name,
+            ids,
+            embeddings,
+            texts,
+            stored_metadatas,
+            collection_metadata={'embedding_model': model, 'embedding_dimension': dimension}
+        )
+        if lexical and Config.RAG_HYBRID_ENABLED:
+            self.registry.lexical_index.add(document.id, start, list(zip(texts, metadatas)))
+        
+        return dimension
+    
+    @staticmethod
+    def _chunk_ids(document_id, start, count, staging=None):
+        """Shared-collection IDs of a run of a document's chunks"""
+        prefix = f"{document_id}:{staging}" if staging else f"{document_id}"
+        return [f"{prefix}:{start + i}" for i in range(count)]
+    
+    @staticmethod
+    def _staged_metadata(metadata):
+        """Metadata of a chunk written but not yet serving: without 'document_id' no query filter matches it"""
+        staged = {key: value for key, value in metadata.items() if key != 'document_id'}
+        staged['staged_document_id'] = metadata['document_id']
+        return staged
+    
+    def _chunk_metadata(self, collection_name, document, index, metadata):
+        """Vector store metadata of a document's chunk"""
+        if not self.is_shared_collection(collection_name):
+            # Legacy layout: one collection per document
+            return dict(metadata)
+        # Shared layout: chunks carry document/user metadata for filtering
+        return {
+            **metadata,
+            'document_id': document.id,
+            'user_id': int(document.user_id),
+            'chunk_index': index
+        }
+    
+    def reembed_document(self, document, model, chunks, throttle=None):
+        """
+        Re-embed a document into the collection for model and switch it over
         
-        elif ext in ['docx', 'doc']:
-            doc = DocxDocument(filepath)
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+        The old vectors keep serving queries until the Document row (and its
+        deduplicated references) is repointed in a single commit; only then
+        are they removed and the keyword index rewritten. When the target is
+        the document's current shared collection (same model, or a re-split)
+        the new chunks are staged there under fresh IDs and without a
+        'document_id', so no query sees them until they are published right
+        after the commit; a legacy per-document collection is re-embedded
+        into a new collection instead. A collection that does not exist in
+        the configured vector store yet (after a backend switch) is simply
+        filled. A failed run removes what it wrote.
         
-        elif ext in ['txt', 'md']:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                text = f.read()
+        Args:
+            document: Original (non-reference) ready Document
+            model: Target embedding model
+            chunks: Iterable of (text, metadata)
+            throttle: Optional callable(chunk count), called after every batch
+            
+        Returns:
+            int: Number of chunks indexed
+            
+        Raises:
+            ValueError: If the document has no text or changed while re-embedding
+        """
+        document_id = document.id
+        old_collection = document.vector_store_id
+        target_collection = self.collection_name_for(document.user_id, model, document.job_id)
+        # After a VECTOR_STORE_BACKEND switch the old collection is not in this store
+        old_in_store = bool(old_collection) and self.vector_store.has_collection(old_collection)
+        if target_collection == old_collection and not self.is_shared_collection(target_collection):
+            # A per-document collection cannot hide chunks from queries: use a fresh one
+            target_collection = self.collection_name_for(document.user_id, model)
+        in_place = target_collection == old_collection and old_in_store
         
+        old_ids = []
+        staging = None
+        if in_place:
+            # The serving chunks, to be removed once the staged ones are published
+            old_ids = [chunk_id for chunk_id, _ in self.vector_store.get_chunks(target_collection, document_id)]
+            staging = uuid.uuid4().hex[:8]
         else:
-            raise ValueError(f'Unsupported file type: {ext}')
+            # Start from a clean target (an earlier attempt may have been interrupted)
+            try:
+                self._delete_vectors(target_collection, document_id)
+            except Exception:
+                pass  # Nothing indexed there yet
         
-        if not text.strip():
+        indexed = 0
+        written = 0  # Chunks possibly in the vector store, including a failed batch
+        dimension = None
+        lexical_rows = []
+        try:
+            batch = []
+            batch_size = Config.EMBEDDING_BATCH_SIZE * Config.EMBEDDING_MAX_IN_FLIGHT
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    written += len(batch)
+                    dimension = self._index_chunks(
+                        batch, target_collection, document, start=indexed, model=model, staging=staging, lexical=False
+                    )
+                    lexical_rows.extend(self._lexical_rows(batch, target_collection, document, indexed))
+                    indexed += len(batch)
+                    if throttle:
+                        throttle(len(batch))
+                    batch = []
+            if batch:
+                written += len(batch)
+                dimension = self._index_chunks(
+                    batch, target_collection, document, start=indexed, model=model, staging=staging, lexical=False
+                )
+                lexical_rows.extend(self._lexical_rows(batch, target_collection, document, indexed))
+                indexed += len(batch)
+                if throttle:
+                    throttle(len(batch))
+            
+            if not indexed:
+                raise ValueError('No text content found in document')
+            
+            # Atomic cutover, unless the document was deleted or replaced meanwhile
+            db.session.expire_all()
+            current = Document.query.get(document_id)
+            if current is None or current.status != 'ready' or current.vector_store_id != old_collection:
+                raise ValueError('Document changed while it was being re-embedded')
+            
+            Document.query.filter(
+                or_(Document.id == document_id, Document.source_document_id == document_id)
+            ).update({
+                Document.vector_store_id: target_collection,
+                Document.embedding_model: model,
+                Document.embedding_dimension: dimension
+            }, synchronize_session=False)
+            db.session.commit()
+        except BaseException:
+            db.session.rollback()
+            try:
+                if in_place:
+                    self.vector_store.delete(target_collection, self._chunk_ids(document_id, 0, written, staging))
+                else:
+                    self._delete_vectors(target_collection, document_id)
+            except Exception as e:
+                print(f"Could not remove new vectors of document {document_id}: {e}")
+            raise
+        
+        # The keyword index follows the vectors that now serve
+        if Config.RAG_HYBRID_ENABLED:
+            self.registry.lexical_index.add(document_id, 0, lexical_rows)
+        # A re-split may have produced fewer chunks than before
+        self._delete_lexical(document_id, from_chunk=indexed)
+        self._invalidate_answers(document_id)
+        
+        try:
+            if in_place:
+                # Publish the staged chunks, then retire the old ones
+                self.vector_store.update_metadata(
+                    target_collection,
+                    self._chunk_ids(document_id, 0, indexed, staging),
+                    [metadata for _, metadata in lexical_rows]
+                )
+                if old_ids:
+                    self.vector_store.delete(target_collection, old_ids)
+            elif old_in_store and old_collection != target_collection:
+                self._delete_vectors(old_collection, document_id)
+        except Exception as e:
+            print(f"Error switching the vectors of document {document_id}: {e}")
+        
+        return indexed
+    
+    def _lexical_rows(self, chunks, collection_name, document, start):
+        """(text, serving metadata) of a batch of chunks"""
+        return [
+            (text, self._chunk_metadata(collection_name, document, start + i, metadata))
+            for i, (text, metadata) in enumerate(chunks)
+        ]
+    
+    def apply_replacement(self, document, chunks, filepath, filename, content_hash, file_size, progress=None):
+        """
+        Bring a document's index up to date with a new version by chunk diff
+        
+        Chunks of the new version whose text is already indexed keep their
+        vectors (only their position metadata is refreshed); new texts are
+        embedded and inserted, and indexed texts no longer present are
+        deleted. New chunks are inserted before old ones are removed so
+        queries never see the document half-empty.
+        
+        Args:
+            document: Document in 'updating' state
+            chunks: List of (text, metadata) of the new version
+            filepath, filename, content_hash, file_size: The new upload
+            progress: Optional callable(percent)
+            
+        Returns:
+            dict: Number of chunks kept, embedded and deleted
+            
+        Raises:
+            ValueError: If the new version has no text or the document was deleted meanwhile
+        """
+        if not chunks:
             raise ValueError('No text content found in document')
         
-        return text
+        document_id = document.id
+        collection_name = document.vector_store_id
+        shared = self.is_shared_collection(collection_name)
+        model = self.document_model(document)
+        
+        # Multiset of indexed chunk texts -> chunk IDs
+        indexed = {}
+        for chunk_id, content in self.vector_store.get_chunks(collection_name, document_id if shared else None):
+            indexed.setdefault(hashlib.sha256(content.encode('utf-8')).hexdigest(), []).append(chunk_id)
+        
+        kept_ids, kept_metadatas, inserts = [], [], []
+        for index, (text, metadata) in enumerate(chunks):
+            chunk_ids = indexed.get(hashlib.sha256(text.encode('utf-8')).hexdigest())
+            if chunk_ids:
+                kept_ids.append(chunk_ids.pop())
+                kept_metadatas.append(self._chunk_metadata(collection_name, document, index, metadata))
+            else:
+                inserts.append((index, text, metadata))
+        removed_ids = [chunk_id for chunk_ids in indexed.values() for chunk_id in chunk_ids]
+        
+        inserted_ids = []
+        try:
+            batch_size = Config.EMBEDDING_BATCH_SIZE * Config.EMBEDDING_MAX_IN_FLIGHT
+            for offset in range(0, len(inserts), batch_size):
+                batch = inserts[offset:offset + batch_size]
+                embeddings = self.registry.batch_embedder_for(model).embed_documents([text for _, text, _ in batch])
+                # Positions shift between versions, so new chunks get fresh IDs
+                ids = [f"{document_id}:{uuid.uuid4().hex}" if shared else str(uuid.uuid4()) for _ in batch]
+                self.vector_store.add(
+                    collection_name,
+                    ids,
+                    embeddings,
+                    [text for _, text, _ in batch],
+                    [self._chunk_metadata(collection_name, document, index, metadata) for index, _, metadata in batch],
+                    collection_metadata={'embedding_model': model, 'embedding_dimension': len(embeddings[0])}
+                )
+                inserted_ids.extend(ids)
+                if progress:
+                    progress(10 + 80 * (offset + len(batch)) // len(inserts))
+            
+            if kept_ids:
+                self.vector_store.update_metadata(collection_name, kept_ids, kept_metadatas)
+            
+            db.session.expire_all()
+            current = Document.query.get(document_id)
+            if current is None or current.status != 'updating':
+                raise ValueError('Document was deleted while it was being replaced')
+        except BaseException:
+            if inserted_ids:
+                try:
+                    self.vector_store.delete(collection_name, inserted_ids)
+                except Exception as e:
+                    print(f"Could not remove new vectors of document {document_id}: {e}")
+            raise
+        
+        if removed_ids:
+            self.vector_store.delete(collection_name, removed_ids)
+        
+        if Config.RAG_HYBRID_ENABLED:
+            self._delete_lexical(document_id)
+            for offset in range(0, len(chunks), Config.EMBEDDING_BATCH_SIZE):
+                batch = chunks[offset:offset + Config.EMBEDDING_BATCH_SIZE]
+                self.registry.lexical_index.add(document_id, offset, [
+                    (text, self._chunk_metadata(collection_name, document, offset + i, metadata))
+                    for i, (text, metadata) in enumerate(batch)
+                ])
+        
+        old_filepath = current.filepath
+        current.filename = filename
+        current.filepath = filepath
+        current.content_hash = content_hash
+        current.file_size = file_size
+        current.status = 'ready'
+        current.progress = 100
+        current.error_message = None
+        db.session.commit()
+        
+        self._invalidate_answers(document_id)
+        if old_filepath != filepath:
+            try:
+                os.remove(old_filepath)
+            except OSError as e:
+                print(f"Error deleting replaced file: {e}")
+        
+        return {'kept': len(kept_ids), 'embedded': len(inserted_ids), 'deleted': len(removed_ids)}
+    
+    def _delete_vectors(self, collection_name, document_id):
+        """Delete a document's chunks, or its whole legacy collection"""
+        if self.is_shared_collection(collection_name):
+            self.vector_store.delete_document(collection_name, document_id)
+        elif collection_name:
+            self.vector_store.drop_collection(collection_name)
+    
+    def _delete_lexical(self, document_id, from_chunk=0):
+        """Remove a document's chunks from the keyword index"""
+        if Config.RAG_HYBRID_ENABLED:
+            self.registry.lexical_index.delete_document(document_id, from_chunk)
     
-    def _create_vector_store(self, text, collection_name):
-        """Create vector store from text"""
-        # Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
+    def _invalidate_answers(self, document_id):
+        """Forget cached answers drawn from a document in this worker (others notice the version change)"""
+        if Config.RAG_ANSWER_CACHE_ENABLED:
+            self.registry.answer_cache.invalidate_documents([document_id])
+    
+    def _embed_query(self, query, model=None):
+        """Embed a query, served from the recent-query LRU when possible"""
+        model = model or Config.EMBEDDING_MODEL
+        return self.registry.query_embedding_cache.get_or_embed(
+            model,
+            query,
+            self.registry.batch_embedder_for(model).embed_query
         )
-        chunks = text_splitter.split_text(text)
-        
-        # Create Chroma vector store
-        vector_store = Chroma.from_texts(
-            texts=chunks,
-            embedding=self.embeddings,
-            collection_name=collection_name,
-            client=self.chroma_client
+    
+    def _query_collection(self, collection_name, query_embedding, k, document_ids=None):
+        """Nearest-neighbour search of one collection by a precomputed vector"""
+        hits = self.vector_store.query(
+            collection_name,
+            query_embedding,
+            k,
+            document_ids=document_ids,
+            include_embeddings=Config.RAG_MMR_ENABLED
+        )
+        return [
+            RetrievedChunk(
+                document=LangchainDocument(page_content=hit.content, metadata=hit.metadata),
+                score=hit.score,
+                embedding=hit.embedding
+            )
+            for hit in hits
+        ]
+    
+    def _search_lexical(self, query, document_ids, k):
+        """BM25 keyword search of the given documents"""
+        return [
+            RetrievedChunk(
+                document=LangchainDocument(page_content=content, metadata=metadata),
+                score=score,
+                embedding=None
+            )
+            for content, metadata, score in self.registry.lexical_index.search(query, document_ids, k)
+        ]
+    
+    def _retrieve(self, query, documents):
+        """
+        Query every collection holding the given documents in parallel
+        
+        Collections are searched on the shared retrieval pool. Whatever
+        finishes within RAG_RETRIEVAL_DEADLINE_SECONDS is merged by score into
+        a global top-k (optionally MMR re-ranked); slower or failing
+        collections are reported instead of blocking the request. While an
+        embedding migration is in progress documents may span several
+        models; the query is embedded once per model. With RAG_HYBRID_ENABLED
+        a BM25 keyword search runs alongside and the two rankings are
+        combined by reciprocal-rank fusion.
+        
+        Args:
+            query: User question
+            documents: Document rows to search
+            
+        Returns:
+            tuple: (ranked RetrievedChunk list, report of timed out / failed documents)
+        """
+        # Group documents by collection so shared collections are queried once
+        collections = {}
+        for doc in documents:
+            collections.setdefault((doc.vector_store_id, self.document_model(doc)), []).append(doc)
+        
+        # Embed the query once per model and reuse the vector for every collection
+        query_embeddings = {
+            model: self._embed_query(query, model)
+            for model in sorted({model for _, model in collections})
+        }
+        
+        # Over-fetch candidates when MMR will thin them out afterwards
+        fetch_k = Config.RAG_MMR_FETCH_K if Config.RAG_MMR_ENABLED else Config.RAG_TOP_K
+        
+        executor = self.registry.retrieval_executor
+        futures = {}
+        for (collection_name, model), docs in collections.items():
+            document_ids = None
+            if self.is_shared_collection(collection_name):
+                # Deduplicated uploads point at the chunks of their source document
+                document_ids = sorted({doc.source_document_id or doc.id for doc in docs})
+            future = executor.submit(
+                self._query_collection, collection_name, query_embeddings[model], fetch_k, document_ids
+            )
+            # Plain values only: ORM rows must not leak into worker threads
+            futures[future] = [{'id': doc.id, 'filename': doc.filename} for doc in docs]
+        
+        lexical_future = None
+        if Config.RAG_HYBRID_ENABLED:
+            lexical_future = executor.submit(
+                self._search_lexical,
+                query,
+                sorted({doc.source_document_id or doc.id for doc in documents}),
+                fetch_k
+            )
+        
+        done, not_done = wait(
+            [*futures, *([lexical_future] if lexical_future else [])],
+            timeout=Config.RAG_RETRIEVAL_DEADLINE_SECONDS
         )
         
-        return vector_store
+        result_lists = []
+        failed_documents = []
+        for future in done:
+            if future is lexical_future:
+                continue
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                print(f"Error retrieving from {', '.join(d['filename'] for d in futures[future])}: {e}")
+                failed_documents.extend(futures[future])
+        
+        timed_out_documents = []
+        for future in not_done:
+            future.cancel()
+            if future is not lexical_future:
+                timed_out_documents.extend(futures[future])
+        
+        # Keyword results are a bonus: vector search alone still answers
+        lexical_matches = []
+        if lexical_future is not None and lexical_future in done:
+            try:
+                lexical_matches = lexical_future.result()
+            except Exception as e:
+                print(f"Keyword search error: {e}")
+        
+        ranked = merge_top_k(result_lists, fetch_k)
+        if Config.RAG_MMR_ENABLED and len(query_embeddings) == 1:
+            query_embedding = next(iter(query_embeddings.values()))
+            ranked = mmr_rerank(query_embedding, ranked, Config.RAG_TOP_K, Config.RAG_MMR_LAMBDA)
+        else:
+            # MMR needs every vector in one embedding space
+            ranked = ranked[:Config.RAG_TOP_K]
+        
+        if lexical_matches:
+            ranked = reciprocal_rank_fusion([ranked, lexical_matches], Config.RAG_TOP_K, Config.RAG_RRF_K)
+        
+        return ranked, {
+            'timed_out_documents': timed_out_documents,
+            'failed_documents': failed_documents,
+            'lexical_matches': len(lexical_matches)
+        }
     
     def chat_with_documents(self, query, user_id, use_internet=False):
         """
@@ -167,40 +953,131 @@ class RAGService:
         Returns:
             dict: Response with answer and sources
         """
+        chat = self._prepare_chat(query, user_id, use_internet)
+        if chat['cached'] is not None:
+            return chat['cached']
+        
+        # Generate response
+        response = self.llm.invoke(chat['prompt'])
+        return self._finish_chat(chat, user_id, query, response.content)
+    
+    def stream_chat_with_documents(self, query, user_id, use_internet=False):
+        """
+        Chat with user's documents using RAG, streaming the answer
+        
+        Retrieval runs before this returns, so its errors are raised here;
+        the answer is then generated as the returned iterator is consumed.
+        
+        Args:
+            query: User question
+            user_id: User ID
+            use_internet: Whether to use internet search
+            
+        Returns:
+            iterator: (event, data) pairs: one 'metadata' event with the sources
+            and retrieval report, 'token' events with answer text as it is
+            generated, and a final 'done' event with the whole answer
+        """
+        chat = self._prepare_chat(query, user_id, use_internet)
+        return self._stream_chat(chat, user_id, query)
+    
+    def _stream_chat(self, chat, user_id, query):
+        cached = chat['cached']
+        if cached is not None:
+            yield 'metadata', {key: value for key, value in cached.items() if key != 'answer'}
+            yield 'token', {'content': cached['answer']}
+            yield 'done', {'answer': cached['answer']}
+            return
+        
+        yield 'metadata', {**chat['result'], 'cached': False}
+        
+        parts = []
+        for chunk in self.llm.stream(chat['prompt']):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield 'token', {'content': chunk.content}
+        
+        # Recorded only once the answer is complete; a client that disconnects
+        # early leaves no history entry
+        answer = ''.join(parts)
+        self._finish_chat(chat, user_id, query, answer)
+        yield 'done', {'answer': answer}
+    
+    def _prepare_chat(self, query, user_id, use_internet):
+        """
+        Everything of a RAG chat up to the LLM call
+        
+        Returns:
+            dict: 'cached' holds the full response on an answer cache hit;
+            otherwise 'prompt' is the prompt to answer and 'result' the
+            response fields other than the answer
+        """
         # Get user's documents
-        documents = Document.query.filter_by(user_id=user_id).all()
+        # Documents being replaced keep answering from their current chunks
+        documents = Document.query.filter_by(user_id=user_id).filter(
+            Document.status.in_(['ready', 'updating'])
+        ).all()
         
         if not documents:
+            if Document.query.filter_by(user_id=user_id).filter(Document.status.notin_(['failed', 'deleted'])).first():
+                raise ValueError('Your documents are still being processed. Please try again shortly.')
             raise ValueError('No documents found. Please upload documents first.')
         
-        # Combine all document collections
-        all_docs = []
-        for doc in documents:
-            try:
-                vector_store = Chroma(
-                    collection_name=doc.vector_store_id,
-                    embedding_function=self.embeddings,
-                    client=self.chroma_client
-                )
-                # Retrieve relevant documents
-                retrieved_docs = vector_store.similarity_search(query, k=3)
-                all_docs.extend(retrieved_docs)
-            except Exception as e:
-                print(f"Error retrieving from {doc.filename}: {e}")
+        # Web search runs alongside retrieval, on its own deadline
+        search_future = None
+        if use_internet:
+            search_future = self.registry.search_executor.submit(self.search_tool.run, query)
+            search_deadline = time.monotonic() + Config.RAG_WEB_SEARCH_TIMEOUT_SECONDS
+        
+        # Near-identical questions about the same documents reuse an earlier answer.
+        # Web results change over time, so answers that used them are not cached.
+        cache_scope = None
+        query_embedding = None
+        if Config.RAG_ANSWER_CACHE_ENABLED and not use_internet:
+            cache_scope = (document_set_version(documents), Config.OPENAI_MODEL, Config.EMBEDDING_MODEL)
+            query_embedding = self._embed_query(query)
+            cached = self.registry.answer_cache.get(cache_scope, query_embedding)
+            if cached is not None:
+                self._record_chat(user_id, query, cached['answer'], {
+                    'use_internet': use_internet,
+                    'num_sources': len(cached['sources']),
+                    'cached': True
+                })
+                return {'cached': {**cached, 'cached': True}}
+        
+        # Fan out across collections in parallel, bounded by the request deadline
+        try:
+            ranked_chunks, retrieval_report = self._retrieve(query, documents)
+        except BaseException:
+            if search_future is not None:
+                self.search_tool.abandon(search_future, timed_out=False)
+            raise
         
-        if not all_docs:
+        if not ranked_chunks:
+            if search_future is not None:
+                self.search_tool.abandon(search_future, timed_out=False)
+            if retrieval_report['timed_out_documents']:
+                raise ValueError('Document retrieval timed out. Please try again.')
             raise ValueError('Could not retrieve relevant information from documents')
         
-        # Build context from documents
-        context = "\n\n".join([doc.page_content for doc in all_docs])
+        # Build token-budgeted context from the ranked chunks
+        context, context_report = self.registry.context_packer.pack(ranked_chunks)
         
-        # Add internet search if enabled
+        # Add internet search results if they arrived in time
         internet_info = ""
-        if use_internet:
+        web_search = None
+        if search_future is not None:
             try:
-                search_results = self.search_tool.run(query)
+                search_results = search_future.result(timeout=max(0.0, search_deadline - time.monotonic()))
                 internet_info = f"\n\nInternet Search Results:\n{search_results}"
+                web_search = 'ok'
+            except FuturesTimeoutError:
+                # Answer from the documents alone rather than wait
+                self.search_tool.abandon(search_future)
+                web_search = 'timed_out'
+                print(f"Internet search timed out after {Config.RAG_WEB_SEARCH_TIMEOUT_SECONDS}s")
             except Exception as e:
+                web_search = 'failed'
                 print(f"Internet search error: {e}")
         
         # Create prompt
@@ -220,39 +1097,109 @@ class RAGService:
             query=query
         )
         
-        # Generate response
-        response = self.llm.invoke(prompt)
-        answer = response.content
+        return {
+            'cached': None,
+            'prompt': prompt,
+            'documents': documents,
+            'cache_scope': cache_scope,
+            'query_embedding': query_embedding,
+            'history_metadata': {
+                'use_internet': use_internet,
+                'web_search': web_search,
+                'num_sources': len(ranked_chunks),
+                'retrieval': retrieval_report,
+                'context': context_report
+            },
+            'result': {
+                'sources': [
+                    {
+                        'content': chunk.document.page_content[:200] + '...',
+                        'metadata': chunk.document.metadata,
+                        'score': chunk.score
+                    }
+                    for chunk in ranked_chunks[:3]
+                ],
+                'use_internet': use_internet,
+                'web_search': web_search,
+                'retrieval': retrieval_report
+            }
+        }
+    
+    def _finish_chat(self, chat, user_id, query, answer):
+        """Save chat history and cache the answer of a prepared chat"""
+        self._record_chat(user_id, query, answer, chat['history_metadata'])
+        
+        result = {'answer': answer, **chat['result']}
+        retrieval_report = result['retrieval']
         
-        # Save chat history
+        # Partial retrievals are not worth repeating to the next asker
+        if chat['cache_scope'] and not (retrieval_report['timed_out_documents'] or retrieval_report['failed_documents']):
+            self.registry.answer_cache.put(
+                chat['cache_scope'],
+                chat['query_embedding'],
+                result,
+                document_ids={doc.source_document_id or doc.id for doc in chat['documents']}
+            )
+        
+        return {**result, 'cached': False}
+    
+    @staticmethod
+    def _record_chat(user_id, query, answer, extra_metadata):
+        """Save a RAG exchange to the chat history"""
         chat_history = ChatHistory(
             user_id=user_id,
             message=query,
             response=answer,
             chat_type='rag',
-            extra_metadata={
-                'use_internet': use_internet,
-                'num_sources': len(all_docs)
-            }
+            extra_metadata=extra_metadata
         )
         db.session.add(chat_history)
         db.session.commit()
-        
+    
+    def get_metrics(self):
+        """Operational metrics for the RAG pipeline"""
         return {
-            'answer': answer,
-            'sources': [
-                {
-                    'content': doc.page_content[:200] + '...',
-                    'metadata': doc.metadata if hasattr(doc, 'metadata') else {}
-                }
-                for doc in all_docs[:3]
-            ],
-            'use_internet': use_internet
+            'extraction_pool': self.registry.extraction_pool.stats(),
+            'embedding': self.registry.batch_embedder.stats(),
+            'query_embedding_cache': self.registry.query_embedding_cache.stats(),
+            'embedding_cache': self.registry.embedding_cache.stats() if Config.EMBEDDING_CACHE_ENABLED else None,
+            'lexical_index': self.registry.lexical_index.stats() if Config.RAG_HYBRID_ENABLED else None,
+            'answer_cache': self.registry.answer_cache.stats() if Config.RAG_ANSWER_CACHE_ENABLED else None,
+            'web_search': self.registry.search_tool.stats()
         }
     
+    def start_embedding_migration(self, model=None):
+        """
+        Re-embed the corpus into another model in the background
+        
+        Args:
+            model: Target embedding model (defaults to EMBEDDING_MODEL)
+            
+        Returns:
+            dict: Migration status
+        """
+        return self.registry.embedding_migration.start(
+            current_app._get_current_object(),
+            model or Config.EMBEDDING_MODEL
+        )
+    
+    def cancel_embedding_migration(self):
+        """Stop the running migration after its current document"""
+        return self.registry.embedding_migration.cancel()
+    
+    def get_embedding_migration_status(self):
+        """Migration progress plus how many documents each model currently serves"""
+        status = self.registry.embedding_migration.status()
+        counts = db.session.query(Document.embedding_model, db.func.count(Document.id)).filter(
+            Document.source_document_id.is_(None),
+            Document.status == 'ready'
+        ).group_by(Document.embedding_model).all()
+        status['documents_by_model'] = {model or LEGACY_EMBEDDING_MODEL: count for model, count in counts}
+        return status
+    
     def get_user_documents(self, user_id):
         """Get all documents for a user"""
-        documents = Document.query.filter_by(user_id=user_id).all()
+        documents = Document.query.filter_by(user_id=user_id).filter(Document.status != 'deleted').all()
         return [doc.to_dict() for doc in documents]
     
     def delete_document(self, document_id, user_id):
@@ -266,11 +1213,37 @@ class RAGService:
         Returns:
             dict: Success message
         """
-        document = Document.query.filter_by(id=document_id, user_id=user_id).first()
+        document = Document.query.filter_by(id=document_id, user_id=user_id).filter(
+            Document.status != 'deleted'
+        ).first()
         
         if not document:
             raise ValueError('Document not found')
         
+        filename = document.filename
+        
+        if document.source_document_id:
+            # A reference to another upload's file and vectors
+            owner = Document.query.get(document.source_document_id)
+            db.session.delete(document)
+        else:
+            # Keep the original as a tombstone while other uploads reference it
+            owner = document
+            document.status = 'deleted'
+        
+        if owner:
+            Document.query.filter_by(id=owner.id).update({Document.ref_count: Document.ref_count - 1})
+            db.session.refresh(owner)
+            if owner.ref_count <= 0:
+                self._drop_document_storage(owner)
+                db.session.delete(owner)
+        
+        db.session.commit()
+        
+        return {'message': f'Document {filename} deleted successfully'}
+    
+    def _drop_document_storage(self, document):
+        """Remove a document's stored file and vectors"""
         # Delete file
         try:
             if os.path.exists(document.filepath):
@@ -278,14 +1251,17 @@ class RAGService:
         except Exception as e:
             print(f"Error deleting file: {e}")
         
-        # Delete vector store collection
+        # Delete the document's chunks, or its whole legacy collection
         try:
-            self.chroma_client.delete_collection(document.vector_store_id)
+            self._delete_vectors(document.vector_store_id, document.id)
         except Exception as e:
             print(f"Error deleting collection: {e}")
         
-        # Delete from database
-        db.session.delete(document)
-        db.session.commit()
+        try:
+            self._delete_lexical(document.id)
+        except Exception as e:
+            print(f"Error deleting keyword index entries: {e}")
+        
+        self._invalidate_answers(document.id)
         
-        return {'message': f'Document {document.filename} deleted successfully'}
+        self.registry.chunk_store.delete(document.id)
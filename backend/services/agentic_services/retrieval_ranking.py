@@ -0,0 +1,90 @@
+import heapq
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+# A retrieved chunk with its relevance score (higher is better) and, when
+# requested from the vector store, its embedding for MMR re-ranking
+RetrievedChunk = namedtuple('RetrievedChunk', ['document', 'score', 'embedding'])
+
+
+def distance_to_score(distance):
+    """
+    Convert a Chroma squared-L2 distance into cosine similarity
+
+    Embeddings are unit-normalised, so ||a - b||^2 = 2 - 2 cos(a, b).
+    """
+    return 1.0 - distance / 2.0
+
+
+def merge_top_k(result_lists, k):
+    """
+    Merge per-collection results into one global top-k by score
+
+    Args:
+        result_lists: Iterable of RetrievedChunk lists
+        k: Number of chunks to keep
+
+    Returns:
+        list: RetrievedChunk, best first
+    """
+    return heapq.nlargest(k, chain.from_iterable(result_lists), key=lambda chunk: chunk.score)
+
+
+def reciprocal_rank_fusion(ranked_lists, k, rrf_k=60):
+    """
+    Fuse several rankings of the same corpus with reciprocal-rank fusion
+
+    Each chunk scores sum(1 / (rrf_k + rank)) over the lists it appears in,
+    so agreement between retrievers outweighs a high rank in just one and
+    the incomparable raw scores (cosine, BM25) never need calibrating.
+    Chunks are matched by text; the first list wins ties and supplies the
+    embedding when a chunk appears in several.
+
+    Args:
+        ranked_lists: RetrievedChunk lists, each best first
+        k: Number of chunks to keep
+        rrf_k: Rank damping constant (60 in the original paper)
+
+    Returns:
+        list: RetrievedChunk with the fused score, best first
+    """
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, chunk in enumerate(ranked, start=1):
+            key = chunk.document.page_content
+            best, score = fused.get(key, (chunk, 0.0))
+            fused[key] = (best, score + 1.0 / (rrf_k + rank))
+    best = sorted(fused.values(), key=lambda item: item[1], reverse=True)[:k]
+    return [chunk._replace(score=score) for chunk, score in best]
+
+
+def mmr_rerank(query_embedding, chunks, k, lambda_mult=0.5):
+    """
+    Maximal-marginal-relevance selection of k chunks
+
+    Drops near-duplicate chunks (e.g. the overlap between neighbouring
+    splitter windows) in favour of diverse ones. Chunks without embeddings
+    are returned unchanged in score order.
+
+    Args:
+        query_embedding: Query vector
+        chunks: Candidate RetrievedChunk list, best first
+        k: Number of chunks to keep
+        lambda_mult: 1 favours relevance only, 0 favours diversity only
+
+    Returns:
+        list: Selected RetrievedChunk in MMR order
+    """
+    if len(chunks) <= 1 or any(chunk.embedding is None for chunk in chunks):
+        return chunks[:k]
+
+    selected = maximal_marginal_relevance(
+        np.array(query_embedding, dtype=np.float32),
+        [chunk.embedding for chunk in chunks],
+        lambda_mult=lambda_mult,
+        k=min(k, len(chunks))
+    )
+    return [chunks[i] for i in selected]
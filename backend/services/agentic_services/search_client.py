@@ -0,0 +1,136 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_query(query):
+    """Cache key of a search query: case, Unicode form and whitespace do not matter"""
+    return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
+
+
+class WebSearchClient:
+    """
+    Shared web search client with a TTL cache.
+    Wraps a search tool (anything with run(query), e.g. DuckDuckGoSearchRun)
+    so every service reuses one instance. Results are cached by normalized
+    query for ttl_seconds in an LRU of max_entries, and concurrent searches
+    for the same query are coalesced into a single backend call whose result
+    (or error) every caller receives. Errors are not cached. Callers that
+    stop waiting on a search report it with abandon(), so stats show how
+    many searches timed out and how many are still holding a worker.
+    """
+
+    def __init__(self, tool, ttl_seconds=300, max_entries=1024):
+        self.tool = tool
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # normalized query -> (result, created)
+        self._in_flight = {}           # normalized query -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.timeouts = 0
+        self.dropped = 0     # Abandoned for another reason (e.g. retrieval failed)
+        self._abandoned = 0  # Timed-out searches still running
+
+    def run(self, query):
+        """
+        Search the web, answering from the cache when possible
+
+        Args:
+            query: Search query
+
+        Returns:
+            str: Search results text
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expirations += 1
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                # Same query already being searched: wait for its result
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = self.tool.run(query)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def abandon(self, future, timed_out=True):
+        """
+        Record that a caller gave up waiting on a search
+
+        Args:
+            future: Future of the submitted run(); cancelled if it has not started
+            timed_out: Whether the caller stopped waiting because of its deadline
+        """
+        future.cancel()
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.dropped += 1
+            self._abandoned += 1
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._lock:
+            self._abandoned -= 1
+
+    def stats(self):
+        """Cache hit rate and backend call counters"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                'errors': self.errors,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'in_flight': len(self._in_flight),
+                'timeouts': self.timeouts,
+                'dropped': self.dropped,
+                'abandoned': self._abandoned
+            }
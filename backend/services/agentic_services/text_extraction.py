@@ -0,0 +1,131 @@
+from bisect import bisect_right
+
+from pypdf import PdfReader
+from docx import Document as DocxDocument
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Plain-text files are read in blocks of roughly this many characters
+TEXT_BLOCK_CHARS = 64 * 1024
+
+
+def open_text_blocks(filepath, ext):
+    """
+    Open a document as a stream of text blocks
+
+    Blocks are yielded lazily (a PDF page, a DOCX paragraph, a slice of a
+    text file) together with their provenance, so the whole document never
+    has to sit in memory at once.
+
+    Args:
+        filepath: Path of the stored upload
+        ext: File extension
+
+    Returns:
+        tuple: (iterator of (text, provenance dict), total block count or None)
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    if ext == 'pdf':
+        reader = PdfReader(filepath)
+        return _pdf_blocks(reader), len(reader.pages)
+
+    if ext in ['docx', 'doc']:
+        doc = DocxDocument(filepath)
+        return _docx_blocks(doc), len(doc.paragraphs)
+
+    if ext in ['txt', 'md']:
+        return _text_file_blocks(filepath), None
+
+    raise ValueError(f'Unsupported file type: {ext}')
+
+
+def _pdf_blocks(reader):
+    for number, page in enumerate(reader.pages, start=1):
+        yield page.extract_text() or '', {'page': number}
+
+
+def _docx_blocks(doc):
+    for number, paragraph in enumerate(doc.paragraphs, start=1):
+        yield paragraph.text, {'paragraph': number}
+
+
+def _text_file_blocks(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        lines = []
+        size = 0
+        first_line = 1
+        for number, line in enumerate(f, start=1):
+            lines.append(line.rstrip('\n'))
+            size += len(line)
+            if size >= TEXT_BLOCK_CHARS:
+                yield '\n'.join(lines), {'line': first_line}
+                lines, size, first_line = [], 0, number + 1
+        if lines:
+            yield '\n'.join(lines), {'line': first_line}
+
+
+def iter_chunks(blocks, chunk_size, chunk_overlap):
+    """
+    Incrementally split a stream of text blocks into overlapping chunks
+
+    Blocks are buffered until a few chunks' worth of text is available; all
+    complete chunks are emitted and only the last one is kept as the start
+    of the next window, so memory stays bounded by the buffer size.
+
+    Args:
+        blocks: Iterable of (text, provenance dict)
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Overlap between neighbouring chunks
+
+    Yields:
+        tuple: (chunk text, metadata with the provenance of the chunk's first
+        block and its 'start_index' in the full document text)
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True
+    )
+    flush_chars = chunk_size * 8
+
+    parts = []
+    length = 0
+    offset = 0          # Position of the buffer start in the full document
+    marks = []          # (buffer offset, provenance) for every buffered block
+
+    def flush(final):
+        nonlocal parts, length, offset, marks
+        text = ''.join(parts)
+        pieces = splitter.create_documents([text])
+        if not final and len(pieces) < 2:
+            return
+
+        emit = pieces if final else pieces[:-1]
+        mark_offsets = [mark_offset for mark_offset, _ in marks]
+        for piece in emit:
+            start = piece.metadata['start_index']
+            provenance = marks[max(0, bisect_right(mark_offsets, start) - 1)][1]
+            yield piece.page_content, {**provenance, 'start_index': offset + start}
+
+        if final:
+            return
+
+        # Keep the last (possibly incomplete) chunk as the head of the next window
+        keep_from = pieces[-1].metadata['start_index']
+        first_mark = max(0, bisect_right(mark_offsets, keep_from) - 1)
+        marks = [(max(0, mark_offset - keep_from), provenance) for mark_offset, provenance in marks[first_mark:]]
+        parts = [text[keep_from:]]
+        length = len(parts[0])
+        offset += keep_from
+
+    for text, provenance in blocks:
+        marks.append((length, provenance))
+        parts.append(text + '\n')
+        length += len(text) + 1
+        if length >= flush_chars:
+            yield from flush(final=False)
+
+    if parts:
+        yield from flush(final=True)
@@ -0,0 +1,13 @@
+def split_embedding_model(model):
+    """
+    Split an embedding model spec into the provider model and its dimensions
+
+    A spec of 'text-embedding-3-large@256' asks the provider for shortened
+    256-dimensional vectors; a bare model name uses its native size.
+
+    Returns:
+        tuple: (model name, dimensions or None)
+    """
+    name, _, dimensions = model.partition('@')
+    return name, int(dimensions) if dimensions else None
+
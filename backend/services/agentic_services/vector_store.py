@@ -0,0 +1,165 @@
+from collections import namedtuple
+
+from services.agentic_services.retrieval_ranking import distance_to_score
+
+# One search hit: chunk text, its metadata, cosine similarity and (when
+# requested) the stored embedding
+VectorHit = namedtuple('VectorHit', ['content', 'metadata', 'score', 'embedding'])
+
+
+class VectorStore:
+    """
+    Interface RAGService uses to store and search chunk vectors.
+    A collection holds the chunks of one user (or tenant shard) for one
+    embedding model, or of a single document in the legacy layout. Shared
+    collections tag every chunk with a 'document_id' metadata field, which
+    add/query/delete_document use for filtering.
+    """
+
+    def add(self, collection_name, ids, embeddings, documents, metadatas, collection_metadata=None):
+        """
+        Add or replace chunks in a collection, creating it if needed
+
+        A chunk whose ID already exists is overwritten (vector, text and
+        metadata), so re-running a write is safe on every backend.
+
+        Args:
+            collection_name: Target collection
+            ids: Chunk IDs
+            embeddings: One vector per chunk
+            documents: Chunk texts
+            metadatas: One metadata dict per chunk
+            collection_metadata: Recorded on the collection when it is created
+        """
+        raise NotImplementedError
+
+    def query(self, collection_name, embedding, k, document_ids=None, include_embeddings=False):
+        """
+        Nearest-neighbour search of one collection
+
+        Args:
+            collection_name: Collection to search
+            embedding: Query vector
+            k: Number of hits
+            document_ids: Only return chunks of these documents (shared collections)
+            include_embeddings: Also return the stored vectors
+
+        Returns:
+            list: VectorHit, best first
+        """
+        raise NotImplementedError
+
+    def has_collection(self, collection_name):
+        """Whether a collection exists in this store"""
+        raise NotImplementedError
+
+    def get_chunks(self, collection_name, document_id=None):
+        """
+        IDs and texts of the chunks in a collection
+
+        Args:
+            collection_name: Collection to read
+            document_id: Only chunks of this document (shared collections)
+
+        Returns:
+            list: (chunk ID, text) tuples
+        """
+        raise NotImplementedError
+
+    def update_metadata(self, collection_name, ids, metadatas):
+        """Replace the metadata of existing chunks, keeping their vectors"""
+        raise NotImplementedError
+
+    def delete(self, collection_name, ids):
+        """Remove chunks by ID"""
+        raise NotImplementedError
+
+    def delete_document(self, collection_name, document_id):
+        """Remove every chunk of a document from a shared collection"""
+        raise NotImplementedError
+
+    def drop_collection(self, collection_name):
+        """Remove a whole collection"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Backend-specific counters"""
+        return {}
+
+    def close(self):
+        """Flush and release resources"""
+
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a persistent Chroma client"""
+
+    def __init__(self, client, batch_size=256):
+        self.client = client
+        self.batch_size = batch_size
+
+    def add(self, collection_name, ids, embeddings, documents, metadatas, collection_metadata=None):
+        collection = self.client.get_or_create_collection(collection_name, metadata=collection_metadata)
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            collection.upsert(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+
+    def query(self, collection_name, embedding, k, document_ids=None, include_embeddings=False):
+        include = ['documents', 'metadatas', 'distances']
+        if include_embeddings:
+            include.append('embeddings')
+
+        collection = self.client.get_collection(collection_name)
+        result = collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where={'document_id': {'$in': list(document_ids)}} if document_ids is not None else None,
+            include=include
+        )
+        embeddings = result['embeddings'][0] if include_embeddings else None
+        return [
+            VectorHit(
+                content=content,
+                metadata=metadata or {},
+                score=distance_to_score(distance),
+                embedding=embeddings[i] if embeddings is not None else None
+            )
+            for i, (content, metadata, distance) in enumerate(zip(
+                result['documents'][0], result['metadatas'][0], result['distances'][0]
+            ))
+        ]
+
+    def has_collection(self, collection_name):
+        try:
+            self.client.get_collection(collection_name)
+        except Exception:
+            return False
+        return True
+
+    def get_chunks(self, collection_name, document_id=None):
+        result = self.client.get_collection(collection_name).get(
+            where={'document_id': document_id} if document_id is not None else None,
+            include=['documents']
+        )
+        return list(zip(result['ids'], result['documents']))
+
+    def update_metadata(self, collection_name, ids, metadatas):
+        collection = self.client.get_collection(collection_name)
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+    def delete(self, collection_name, ids):
+        collection = self.client.get_collection(collection_name)
+        for start in range(0, len(ids), self.batch_size):
+            collection.delete(ids=ids[start:start + self.batch_size])
+
+    def delete_document(self, collection_name, document_id):
+        self.client.get_collection(collection_name).delete(where={'document_id': document_id})
+
+    def drop_collection(self, collection_name):
+        self.client.delete_collection(collection_name)
@@ -3,6 +3,7 @@ from datetime import datetime
 from models import db
 from models import GuardrailsConfig, GuardrailsLog
 from services.auth_services.auth_service import AuthService
+from services.guardrails_services.streaming_guardrail import StreamingGuardrail
 from config import Config
 
 class GuardrailsService:
@@ -140,6 +141,56 @@ class GuardrailsService:
             'action': 'blocked' if not passed else 'allowed'
         }
     
+    @staticmethod
+    def check_stream_output(events, user_id):
+        """
+        Apply output guardrails to a streamed answer as it is generated
+        
+        'token' events are passed through a StreamingGuardrail, which holds
+        back only the few characters a rule match could still extend into
+        and redacts violations before the text is sent. The final 'done'
+        event carries the checked answer, whether anything was redacted, and
+        whether the answer was revised because a match longer than the
+        stream window had already been sent (the client should then show
+        'answer' in place of the streamed text).
+        
+        Args:
+            events: Iterator of (event, data) pairs ending with a 'done' event
+            user_id: User ID
+            
+        Returns:
+            iterator: The checked (event, data) pairs
+        """
+        if not Config.GUARDRAILS_ENABLED:
+            for event, data in events:
+                if event == 'done':
+                    data = {**data, 'redacted': False}
+                yield event, data
+            return
+        
+        guardrail = StreamingGuardrail(
+            GuardrailsConfig.query.filter_by(enabled=True).all(),
+            user_id,
+            max_window=Config.GUARDRAILS_STREAM_WINDOW
+        )
+        for event, data in events:
+            if event == 'token':
+                content = guardrail.feed(data['content'])
+                if content:
+                    yield 'token', {**data, 'content': content}
+            elif event == 'done':
+                tail = guardrail.finish()
+                if tail:
+                    yield 'token', {'content': tail}
+                yield 'done', {
+                    **data,
+                    'answer': guardrail.cleaned_content,
+                    'redacted': not guardrail.passed,
+                    'revised': guardrail.revised
+                }
+            else:
+                yield event, data
+    
     @staticmethod
     def get_guardrails_config():
         """Get all guardrails configuration"""
@@ -0,0 +1,204 @@
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from models import db
+from models import GuardrailsLog
+
+REDACTION = '[REDACTED]'
+
+
+def max_match_length(pattern, limit):
+    """
+    Longest text a regex can match, capped at limit
+
+    Unbounded patterns (`+`, `*`) report the cap, as do patterns the
+    parser cannot size.
+    """
+    try:
+        return min(sre_parse.parse(pattern, re.IGNORECASE).getwidth()[1], limit)
+    except Exception:
+        return limit
+
+
+def redact(text, spans):
+    """Replace (start, end) spans of text with REDACTION; overlapping spans share one marker"""
+    parts = []
+    last = 0
+    for start, end in sorted(spans):
+        if start < last:
+            last = max(last, end)
+            continue
+        parts.extend((text[last:start], REDACTION))
+        last = end
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+class StreamingGuardrail:
+    """
+    Output guardrails applied to an answer as it is generated.
+    Text is released once no rule match can still extend into it: the last
+    `window` characters (the longest possible match, capped at max_window)
+    are held back, and the held-back point is moved earlier while a match
+    straddles it, or by up to `window` characters while it falls inside a
+    word. Rules see the held-back text together with the last max_window
+    released characters, so word boundaries and matches that began in
+    released text are judged on the real answer. Matches are logged and,
+    for high severity rules, redacted exactly like
+    GuardrailsService.check_content does on a finished answer, without
+    buffering the whole response.
+
+    A rule that can match more than max_window characters (such as the
+    default PROMPT_INJECTION pattern) may still start in text that was
+    already sent. finish() therefore checks the whole answer once more;
+    if a high severity match was released unredacted, `revised` is set
+    and cleaned_content is the fully redacted answer.
+    """
+
+    def __init__(self, rules, user_id, max_window=128):
+        self.user_id = user_id
+        self.max_window = max_window
+        self._rules = [
+            (rule, re.compile(rule.pattern, re.IGNORECASE))
+            for rule in rules if rule.pattern
+        ]
+        self.window = max(
+            (max_match_length(rule.pattern, max_window) for rule, _ in self._rules),
+            default=0
+        )
+        self._generated = []  # Every generated piece, for the final check
+        self._context = ''    # Last max_window characters of released (unredacted) text
+        self._pending = ''
+        self._offset = 0      # Characters of generated text already released
+        self._released = []
+        self._spans = []      # (rule position, start, end) of every recorded match
+        self.violations = []
+        self.revised = False
+
+    @property
+    def passed(self):
+        return not any(v['severity'] == 'high' for v in self.violations)
+
+    @property
+    def cleaned_content(self):
+        """Everything released so far, or the corrected answer once revised"""
+        if not self.revised:
+            return ''.join(self._released)
+        high = [
+            (start, end) for position, start, end in self._spans
+            if self._rules[position][0].severity == 'high'
+        ]
+        return redact(''.join(self._generated)[:self._offset], high)
+
+    def feed(self, text):
+        """
+        Add generated text
+
+        Returns:
+            str: Checked text that is safe to show now (possibly empty)
+        """
+        self._generated.append(text)
+        self._pending += text
+        return self._release(self._safe_point(len(self._pending) - self.window))
+
+    def finish(self):
+        """
+        Check the held-back tail, then the whole answer, once generation has ended
+
+        Returns:
+            str: The remaining checked text
+        """
+        released = self._release(len(self._pending))
+
+        # Matches longer than the context could not be seen while streaming
+        answer = ''.join(self._generated)
+        for position, (rule, regex) in enumerate(self._rules):
+            for match in regex.finditer(answer):
+                if self._record(position, match.group(), match.start(), match.end()) and rule.severity == 'high':
+                    self.revised = True
+
+        db.session.commit()
+        return released
+
+    def _safe_point(self, point):
+        """Move point back until no match spans it, and off a word by at most window characters"""
+        if point <= 0:
+            return 0
+        buffer = self._context + self._pending
+        shift = len(self._context)
+        point += shift
+
+        # Prefer whole words, but never hold back more than a window for them
+        start = point
+        while start > max(shift, point - self.window) and not buffer[start - 1].isspace():
+            start -= 1
+        if start > 0 and buffer[start - 1].isspace():
+            point = start
+
+        while True:
+            moved = point
+            for _, regex in self._rules:
+                for match in regex.finditer(buffer):
+                    if match.start() < moved < match.end():
+                        moved = match.start()
+            moved = max(moved, shift)
+            if moved == point:
+                return point - shift
+            point = moved
+
+    def _record(self, position, matched_text, start, end):
+        """Log a match at absolute [start, end) unless it overlaps one already recorded"""
+        for seen, seen_start, seen_end in self._spans:
+            if seen == position and seen_start < end and start < seen_end:
+                return False
+        rule = self._rules[position][0]
+        self._spans.append((position, start, end))
+        self.violations.append({
+            'rule_type': rule.rule_type,
+            'severity': rule.severity,
+            'matched_text': matched_text,
+            'position': (start, end)
+        })
+        db.session.add(GuardrailsLog(
+            user_id=self.user_id,
+            guardrail_id=rule.id,
+            detected_rule=rule.rule_type,
+            content_snippet=matched_text[:200],
+            action_taken='blocked' if rule.severity == 'high' else 'warned'
+        ))
+        return True
+
+    def _release(self, point):
+        if point <= 0:
+            return ''
+        buffer = self._context + self._pending
+        shift = len(self._context)
+        end = shift + point
+        base = self._offset - shift  # Absolute position of buffer[0]
+
+        spans = []
+        for position, (rule, regex) in enumerate(self._rules):
+            for match in regex.finditer(buffer):
+                # Matches inside the context were recorded when it was released
+                if match.end() <= shift or match.end() > end:
+                    continue
+                if not self._record(position, match.group(), base + match.start(), base + match.end()):
+                    continue
+                if rule.severity == 'high':
+                    if match.start() < shift:
+                        # Its beginning has already been sent
+                        self.revised = True
+                    spans.append((max(match.start(), shift) - shift, match.end() - shift))
+
+        text = buffer[shift:end]
+        released = redact(text, spans)
+
+        self._context = (self._context + text)[-self.max_window:]
+        self._pending = self._pending[point:]
+        self._offset += point
+        self._released.append(released)
+        return released
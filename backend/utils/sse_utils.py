@@ -0,0 +1,50 @@
+import json
+from flask import Response, stream_with_context
+
+
+def format_sse(event, data):
+    """
+    Encode one Server-Sent Event with a JSON payload
+    
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+        
+    Returns:
+        str: The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events):
+    """
+    Stream (event, data) pairs to the client as Server-Sent Events.
+    
+    The request context stays available while the events are generated, so
+    the generator can keep using the database session. An exception raised
+    mid-stream is sent as a final 'error' event, since the status code has
+    already gone out with the first event.
+    
+    Args:
+        events: Iterator of (event, data) pairs
+        
+    Returns:
+        Response: text/event-stream response
+    """
+    def generate():
+        try:
+            for event, data in events:
+                yield format_sse(event, data)
+        except Exception as e:
+            print(f"Streaming error: {e}")
+            yield format_sse('error', {'message': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Keep reverse proxies (nginx) from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )